@@ -1,62 +1,113 @@
-from typing import List, Iterator, Tuple, NamedTuple, MutableSequence
-import bpy, mathutils  # type: ignore
+from typing import List, Iterator, Tuple, NamedTuple, MutableSequence, Sequence
+import bpy  # type: ignore
+import numpy
 from .. import gltf
 from .types import bl_obj_gltf_node
 import array
 import ctypes
 
 
-def euler2quat(x: float, y: float, z: float) -> mathutils.Quaternion:
-    # return mathutils.Euler((x, y, z)).to_quaternion()
-    # z-up to y-up
-    return mathutils.Euler((x, y, z)).to_quaternion()
+def quaternion_multiply(lhs: numpy.ndarray, rhs: numpy.ndarray) -> numpy.ndarray:
+    """
+    (n, 4) x, y, z, w
+    """
+    x0, y0, z0, w0 = lhs.T
+    x1, y1, z1, w1 = rhs.T
+    return numpy.stack(
+        [
+            w0 * x1 + x0 * w1 + y0 * z1 - z0 * y1,
+            w0 * y1 - x0 * z1 + y0 * w1 + z0 * x1,
+            w0 * z1 + x0 * y1 - y0 * x1 + z0 * w1,
+            w0 * w1 - x0 * x1 - y0 * y1 - z0 * z1,
+        ],
+        axis=-1,
+    )
+
+
+def euler2quat(euler: numpy.ndarray, order: str = "XYZ") -> numpy.ndarray:
+    """
+    (n, 3) radians to (n, 4) x, y, z, w.
+    same as mathutils.Euler(euler, order).to_quaternion(). order is the order of
+    application.
+    """
+    half = numpy.asarray(euler, numpy.float64) * 0.5
+    c = numpy.cos(half)
+    s = numpy.sin(half)
+    q: numpy.ndarray | None = None
+    for axis in order:
+        i = "XYZ".index(axis)
+        axis_q = numpy.zeros((len(half), 4))
+        axis_q[:, i] = s[:, i]
+        axis_q[:, 3] = c[:, i]
+        q = axis_q if q is None else quaternion_multiply(axis_q, q)
+    assert q is not None
+    return q
 
 
 class Curve(NamedTuple):
-    times: MutableSequence[float]
-    values: MutableSequence[float]
+    times: numpy.ndarray
+    values: numpy.ndarray
+
+
+def read_curve(curve: bpy.types.FCurve) -> Curve:
+    co = numpy.empty(len(curve.keyframe_points) * 2, numpy.float32)
+    curve.keyframe_points.foreach_get("co", co)
+    co = co.reshape(-1, 2)
+    return Curve(co[:, 0], co[:, 1])
 
 
 def get_curve(
-    data_path: str, curves: List[bpy.types.FCurve]
-) -> tuple[MutableSequence[float], ctypes.Array[gltf.types.Float4]]:
-    x_curve = None
-    y_curve = None
-    z_curve = None
+    data_path: str,
+    curves: List[bpy.types.FCurve],
+    rest: Sequence[float],
+    rotation_mode: str = "XYZ",
+) -> tuple[
+    MutableSequence[float],
+    ctypes.Array[gltf.types.Float3] | ctypes.Array[gltf.types.Float4],
+]:
+    """
+    keyframes at the union of the key times of all axes. an axis that has other
+    key times is evaluated, an axis that has no curve is rest.
+    """
+    component_count = 4 if data_path == "rotation_quaternion" else 3
+    fcurves: list[bpy.types.FCurve | None] = [None] * component_count
     for curve in curves:
-        c = Curve(array.array("f"), array.array("f"))
-        if curve.array_index == 0:
-            x_curve = c
-        elif curve.array_index == 1:
-            y_curve = c
-        elif curve.array_index == 2:
-            z_curve = c
-        else:
+        if curve.array_index >= component_count:
             raise NotImplementedError()
-        for p in curve.keyframe_points:
-            t, v = p.co
-            c.times.append(t)
-            c.values.append(v)
-
-    if data_path == "rotation_euler":
-        if (
-            x_curve
-            and y_curve
-            and z_curve
-            and x_curve.times == y_curve.times
-            and y_curve.times == z_curve.times
-        ):
-            values = (gltf.types.Float4 * len(x_curve.times))()
-            for i, (x, y, z) in enumerate(
-                zip(x_curve.values, y_curve.values, z_curve.values)
-            ):
-                q = euler2quat(x, y, z)
-                values[i] = (q.x, q.y, q.z, q.w)
-            return x_curve.times, values
+        fcurves[curve.array_index] = curve
+    axes = [read_curve(curve) if curve else None for curve in fcurves]
+
+    times = numpy.unique(numpy.concatenate([c.times for c in axes if c]))
+    columns: list[numpy.ndarray] = []
+    for axis, curve, value in zip(axes, fcurves, rest):
+        if axis is None or curve is None:
+            columns.append(numpy.full(len(times), value, numpy.float32))
+        elif numpy.array_equal(axis.times, times):
+            columns.append(axis.values)
         else:
+            columns.append(
+                numpy.array([curve.evaluate(t) for t in times.tolist()], numpy.float32)
+            )
+    values = numpy.stack(columns, axis=-1)
+
+    match data_path:
+        case "rotation_euler":
+            values = euler2quat(values, rotation_mode)
+            values_type = gltf.types.Float4
+        case "rotation_quaternion":
+            # w, x, y, z to x, y, z, w
+            values = values[:, [1, 2, 3, 0]]
+            values_type = gltf.types.Float4
+        case "location" | "scale":
+            values_type = gltf.types.Float3
+        case _:
             raise NotImplementedError()
-    else:
-        raise NotImplementedError()
+
+    values = numpy.ascontiguousarray(values, numpy.float32)
+    return (
+        array.array("f", times.tobytes()),
+        (values_type * len(values)).from_buffer_copy(values.tobytes()),
+    )
 
 
 def get_curves(
@@ -74,6 +125,9 @@ def get_curves(
 
 DATA_PATH_MAP = {
     "rotation_euler": gltf.AnimationChannelTargetPath.rotation,
+    "rotation_quaternion": gltf.AnimationChannelTargetPath.rotation,
+    "location": gltf.AnimationChannelTargetPath.translation,
+    "scale": gltf.AnimationChannelTargetPath.scale,
 }
 
 
@@ -88,8 +142,15 @@ class BlenderAnimationScanner:
             return
 
         bl_action = bl_obj.animation_data.action
+        rotation_mode = bl_obj.rotation_mode
+        if rotation_mode in ("QUATERNION", "AXIS_ANGLE"):
+            rotation_mode = "XYZ"
         for data_path, curves in get_curves(bl_action):
-            times, values = get_curve(data_path, curves)
+            if data_path not in DATA_PATH_MAP:
+                raise NotImplementedError()
+            times, values = get_curve(
+                data_path, curves, getattr(bl_obj, data_path), rotation_mode
+            )
             animation = gltf.Animation(
                 bl_action.name, i, DATA_PATH_MAP[data_path], times, values
             )
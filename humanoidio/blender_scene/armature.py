@@ -1,6 +1,5 @@
-import bpy
-import mathutils  # type: ignore
-from typing import Dict, Optional
+from typing import NamedTuple
+import numpy
 from .. import gltf
 
 EXCLUDE_HUMANOID_PARENT: list[gltf.human_bones.HumanoidBones] = ["head"]
@@ -33,106 +32,151 @@ EXCLUDE_OTHERS: list[str] = [
 ]
 
 
-class BoneConnector:
+def select_connect_child(node: gltf.Node) -> gltf.Node | None:
     """
-    ボーンを適当に接続したり、しない場合でも tail を設定してやる
-
     tail を決める
 
     * child が 0。親からまっすぐに伸ばす
     * child が ひとつ。それ
-    * child が 2つ以上。どれか選べ(同じざひょうのときは少しずらす。head と tail が同じボーンは消滅するので)
+    * child が 2つ以上。どれか選べ(同じざひょうのときは少しずらす)
     """
-
-    def __init__(self, bones: Dict[gltf.Node, bpy.types.EditBone]):
-        self.bones = bones
-
-    def extend_tail(self, node: gltf.Node):
-        """
-        親ボーンと同じ方向にtailを延ばす
-        """
-        bl_bone = self.bones[node]
-        if node.parent:
-            try:
-                bl_parent = self.bones[node.parent]
-                tail_offset = bl_bone.head - bl_parent.head  # type: ignore
-                bl_bone.tail = bl_bone.head + tail_offset
-            except KeyError:
-                print(f"{node}.parent not found")
-
-    def connect_tail(self, node: gltf.Node, tail: gltf.Node):
-        bl_bone = self.bones[node]
-        bl_tail = self.bones[tail]
-        bl_bone.tail = bl_tail.head
-        bl_tail.parent = bl_bone
-        bl_tail.use_connect = True
-
-    def traverse(self, node: gltf.Node, parent: Optional[gltf.Node], is_connect: bool):
-        # connect
-        if parent:
-            # print(f'connect {parent} => {node}')
-            bl_parent = self.bones[parent]
-            bl_bone = self.bones.get(node)
-            if not bl_bone:
-                # not in skin
-                return
-
-            bl_bone.parent = bl_parent
-            if is_connect:
-                if bl_parent.head != bl_bone.head:
-                    bl_parent.tail = bl_bone.head
-                else:
-                    bl_parent.tail = bl_bone.head + mathutils.Vector((0, 0, 1e-4))
-
-                if parent and (
-                    parent.humanoid_bone == "leftShoulder"
-                    or parent.humanoid_bone == "rightShoulder"
-                ):
-                    # https://blenderartists.org/t/rigify-error-generation-has-thrown-an-exception-but-theres-no-exception-message/1228840
-                    pass
-                else:
-                    bl_bone.use_connect = True
-
-        if node.children:
-            # recursive
-            connect_child_index = None
-            if node.humanoid_bone in EXCLUDE_HUMANOID_PARENT:
-                pass
-            elif any(child.humanoid_bone for child in node.children):
-                # humanioid
-                for i, child in enumerate(node.children):
-                    if child.humanoid_bone:
-                        if child.humanoid_bone in EXCLUDE_HUMANOID_CHILDREN:
-                            continue
-                        connect_child_index = i
-                        break
-            else:
-                for i, child in enumerate(node.children):
-                    if child.name in EXCLUDE_OTHERS:
-                        continue
-                    # とりあえず
-                    connect_child_index = i
-                    break
-
-            # select connect child
-            for i, child in enumerate(node.children):
-                self.traverse(child, node, i == connect_child_index)
-        else:
-            # stop recursive
-            self.extend_tail(node)
-
-
-def connect_bones(bones: Dict[gltf.Node, bpy.types.EditBone]):
-
-    nodes = bones.keys()
-    roots: list[gltf.Node] = []
-
+    if node.humanoid_bone in EXCLUDE_HUMANOID_PARENT:
+        return None
+    if any(child.humanoid_bone for child in node.children):
+        # humanioid
+        for child in node.children:
+            if child.humanoid_bone:
+                if child.humanoid_bone in EXCLUDE_HUMANOID_CHILDREN:
+                    continue
+                return child
+        return None
+    for child in node.children:
+        if child.name in EXCLUDE_OTHERS:
+            continue
+        # とりあえず
+        return child
+    return None
+
+
+def quaternion_to_matrix(q: numpy.ndarray) -> numpy.ndarray:
+    """
+    (n, 4) x, y, z, w to (n, 3, 3)
+    """
+    x, y, z, w = numpy.asarray(q, numpy.float64).reshape(-1, 4).T
+    return numpy.stack(
+        [
+            1 - 2 * (y * y + z * z),
+            2 * (x * y - z * w),
+            2 * (x * z + y * w),
+            2 * (x * y + z * w),
+            1 - 2 * (x * x + z * z),
+            2 * (y * z - x * w),
+            2 * (x * z - y * w),
+            2 * (y * z + x * w),
+            1 - 2 * (x * x + y * y),
+        ],
+        axis=-1,
+    ).reshape(-1, 3, 3)
+
+
+def get_world_matrices(nodes: list[gltf.Node]) -> numpy.ndarray:
+    """
+    (n, 4, 4) world matrices of the nodes. local matrices are T * R * S and are
+    composed from the roots, ancestors that are not in nodes included
+    """
+    # nodes and ancestors. parents first
+    index: dict[int, int] = {}
+    all_nodes: list[gltf.Node] = []
     for node in nodes:
-        if not node.parent:
-            roots.append(node)
-        elif node.parent not in nodes:
-            roots.append(node)
-
-    connector = BoneConnector(bones)
-    for root in roots:
-        connector.traverse(root, None, False)
+        chain: list[gltf.Node] = []
+        current: gltf.Node | None = node
+        while current and id(current) not in index:
+            chain.append(current)
+            current = current.parent
+        for n in reversed(chain):
+            index[id(n)] = len(all_nodes)
+            all_nodes.append(n)
+
+    count = len(all_nodes)
+    translations = numpy.array([n.translation for n in all_nodes], numpy.float64)
+    rotations = numpy.array([n.rotation for n in all_nodes], numpy.float64)
+    scales = numpy.array([n.scale for n in all_nodes], numpy.float64)
+    local = numpy.zeros((count, 4, 4))
+    local[:, :3, :3] = quaternion_to_matrix(rotations) * scales.reshape(-1, 1, 3)
+    local[:, :3, 3] = translations.reshape(-1, 3)
+    local[:, 3, 3] = 1
+
+    parents = numpy.array(
+        [index[id(n.parent)] if n.parent else -1 for n in all_nodes], numpy.int64
+    ).reshape(count)
+    depth = numpy.zeros(count, numpy.int64)
+    for i, parent in enumerate(parents.tolist()):
+        if parent >= 0:
+            depth[i] = depth[parent] + 1
+
+    # one batch for each depth
+    world = local.copy()
+    for d in range(1, int(depth.max(initial=0)) + 1):
+        level = numpy.flatnonzero(depth == d)
+        world[level] = world[parents[level]] @ local[level]
+    return world[[index[id(node)] for node in nodes]].reshape(len(nodes), 4, 4)
+
+
+class BoneLayout(NamedTuple):
+    nodes: list[gltf.Node]
+    # (n, 3)
+    heads: numpy.ndarray
+    # (n, 3)
+    tails: numpy.ndarray
+    # (n,) -1 for root
+    parents: numpy.ndarray
+    # (n,)
+    use_connect: numpy.ndarray
+
+
+def layout_bones(nodes: list[gltf.Node]) -> BoneLayout:
+    """
+    ボーンを適当に接続したり、しない場合でも tail を設定してやる
+
+    heads are the translation of the node world matrices. computed before
+    entering edit mode
+    """
+    index = {id(node): i for i, node in enumerate(nodes)}
+    count = len(nodes)
+    heads = get_world_matrices(nodes)[:, :3, 3]
+    tails = heads + (0, 0.1, 0)
+    parents = numpy.array(
+        [index.get(id(node.parent), -1) for node in nodes], numpy.int64
+    ).reshape(count)
+    has_parent = parents >= 0
+
+    connect = numpy.array(
+        [
+            parent >= 0 and select_connect_child(nodes[parent]) is node
+            for node, parent in zip(nodes, parents.tolist())
+        ],
+        bool,
+    ).reshape(count)
+    child = numpy.flatnonzero(connect)
+    parent = parents[child]
+    # head と tail が同じボーンは消滅するので少しずらす
+    same = (heads[child] == heads[parent]).all(axis=1)
+    offset = numpy.where(same[:, None], (0, 0, 1e-4), 0)
+    tails[parent] = heads[child] + offset
+
+    # 親ボーンと同じ方向にtailを延ばす
+    leaf = numpy.array([not node.children for node in nodes], bool).reshape(count)
+    leaf &= has_parent
+    tails[leaf] = heads[leaf] * 2 - heads[parents[leaf]]
+
+    # https://blenderartists.org/t/rigify-error-generation-has-thrown-an-exception-but-theres-no-exception-message/1228840
+    shoulder = numpy.array(
+        [
+            node.humanoid_bone in ("leftShoulder", "rightShoulder")
+            for node in nodes
+        ],
+        bool,
+    ).reshape(count)
+    use_connect = connect & ~shoulder[numpy.where(has_parent, parents, 0)]
+
+    return BoneLayout(nodes, heads, tails, parents, use_connect)
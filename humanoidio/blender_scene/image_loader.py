@@ -1,22 +1,37 @@
-from typing import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from PIL import Image  # type: ignore
 import io
+import numpy
 
 
-def load(mime: str, data: bytes, yflip: bool) -> tuple[int, int, list[float]]:
+def load(mime: str, data: bytes, yflip: bool = True) -> tuple[int, int, numpy.ndarray]:
+    """
+    width, height and flat float32 rgba. yflip: bottom row first as bpy.types.Image
+    """
     img = Image.open(io.BytesIO(data))
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
 
+    w, h = img.size
+
+    rgba = numpy.asarray(img, numpy.uint8).reshape(h, w, 4)
     if yflip:
-        img = img.flip()
+        rgba = rgba[::-1]
 
-    w, h = img.size
+    pixels = rgba.astype(numpy.float32).reshape(-1)
+    pixels /= 255
+    return w, h, pixels
 
-    # numpy ?
-    def gen() -> Iterator[float]:
-        for r, g, b, a in img.getdata():
-            yield r / 255
-            yield g / 255
-            yield b / 255
-            yield a / 255
 
-    return w, h, [x for x in gen()]
+def load_async(
+    textures: list[tuple[str, bytes]], max_workers: int | None = None
+) -> list[Future[tuple[int, int, numpy.ndarray]]]:
+    """
+    (mime, data) for each texture. returns without waiting, the caller keeps
+    making bpy calls while the textures are decoded on a thread pool
+    """
+    executor = ThreadPoolExecutor(max_workers)
+    futures = [executor.submit(load, mime, data) for mime, data in textures]
+    # the workers exit after the submitted decodes
+    executor.shutdown(wait=False)
+    return futures
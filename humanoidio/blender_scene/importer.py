@@ -1,49 +1,65 @@
-from typing import Callable, cast
+from typing import cast
 import pathlib
-import math
+from concurrent.futures import Future
+import ctypes
+import numpy
 import bpy
-import mathutils  # type: ignore
 from .. import gltf
 from .. import human_bones
 from ..human_rig import humanoid_properties
 from .mesh import create_mesh
-from .armature import connect_bones
+from .armature import layout_bones
 
 
-def convert_obj(src: gltf.Coordinate, dst: gltf.Coordinate, bl_obj: bpy.types.Object):
-    if dst == gltf.Coordinate.BLENDER_ROTATE:
-        if src == gltf.Coordinate.VRM0:
-            bl_obj.rotation_euler = (math.pi * 0.5, 0, math.pi)
-        elif src == gltf.Coordinate.VRM1:
-            bl_obj.rotation_euler = (math.pi * 0.5, 0, 0)
-        else:
-            raise NotImplementedError()
-    else:
-        raise NotImplementedError()
-
-
-def bl_traverse(bl_obj: bpy.types.Object, pred: Callable[[bpy.types.Object], None]):
-    pred(bl_obj)
-
-    for child in bl_obj.children:
-        bl_traverse(child, pred)
-
-
-def set_bone_weight(
-    bl_object: bpy.types.Object, vert_idx: int, bone_name: str, weight_val: float
+def set_bone_weights(
+    bl_object: bpy.types.Object,
+    bone_names: list[str],
+    boneweights: ctypes.Array[gltf.Bdef4],
 ):
-    if weight_val != 0.0:
-        # It can be a problem to assign weights of 0
-        # for bone index 0, if there is always 4 indices in joint_ tuple
-        if bone_name:
-            try:
-                group = bl_object.vertex_groups[bone_name]
-            except KeyError:
-                group = bl_object.vertex_groups.new(name=bone_name)
-            group.add((vert_idx,), weight_val, "ADD")
-
-
-def build_unlit_shader(tree: bpy.types.NodeTree, image: bpy.types.Image | None):
+    """
+    vertices are grouped by (joint, weight). one group.add for each group
+    """
+    data = numpy.frombuffer(boneweights, numpy.float32).reshape(len(boneweights), 8)
+    joints = data[:, 0:4].astype(numpy.int32).reshape(-1)
+    weights = data[:, 4:8].reshape(-1)
+    vertices = numpy.repeat(numpy.arange(len(boneweights), dtype=numpy.int32), 4)
+
+    # It can be a problem to assign weights of 0
+    # for bone index 0, if there is always 4 indices in joint_ tuple
+    valid = weights > 0
+    joints, weights, vertices = joints[valid], weights[valid], vertices[valid]
+    if len(joints) == 0:
+        return
+
+    order = numpy.lexsort((vertices, weights, joints))
+    joints, weights, vertices = joints[order], weights[order], vertices[order]
+    run_start = numpy.flatnonzero(
+        numpy.concatenate(
+            [[True], (joints[1:] != joints[:-1]) | (weights[1:] != weights[:-1])]
+        )
+    )
+    run_end = numpy.append(run_start[1:], len(order))
+
+    groups: dict[str, bpy.types.VertexGroup] = {
+        g.name: g for g in bl_object.vertex_groups
+    }
+    for begin, end in zip(run_start.tolist(), run_end.tolist()):
+        bone_name = bone_names[joints[begin]]
+        if not bone_name:
+            continue
+        group = groups.get(bone_name)
+        if not group:
+            group = bl_object.vertex_groups.new(name=bone_name)
+            groups[bone_name] = group
+        group.add(vertices[begin:end].tolist(), float(weights[begin]), "ADD")
+
+
+def build_unlit_shader(
+    tree: bpy.types.NodeTree, use_texture: bool
+) -> bpy.types.ShaderNodeTexImage | None:
+    """
+    returns the texture node. the image is set after decoding
+    """
     # clear
     nodes = tree.nodes
     for n in nodes:
@@ -57,12 +73,13 @@ def build_unlit_shader(tree: bpy.types.NodeTree, image: bpy.types.Image | None):
     output = nodes.new(type="ShaderNodeOutputMaterial")
     links.new(emission.outputs[0], output.inputs[0])
 
-    if image:
+    if use_texture:
         texture = cast(
             bpy.types.ShaderNodeTexImage, nodes.new(type="ShaderNodeTexImage")
         )
-        texture.image = image
         links.new(texture.outputs[0], emission.inputs[0])
+        return texture
+    return None
 
 
 class Importer:
@@ -75,50 +92,42 @@ class Importer:
         self.materials: list[bpy.types.Material] = []
 
     def load(self, loader: gltf.Loader):
-        textures: list[bpy.types.Image | None] = []
-        for t in loader.textures:
-            match t.data:
-                case pathlib.Path():
-                    if t.data.exists():
-                        bl_image = bpy.data.images.load(
-                            str(t.data), check_existing=True
-                        )
-                    else:
-                        print(f"{t.data} not exists")
-                        bl_image = bpy.data.images.new(t.data.name, width=2, height=2)
-                    textures.append(bl_image)
-                case gltf.TextureData() as data:
-                    try:
-                        from . import image_loader
-
-                        w, h, raw = image_loader.load(data.mime, data.data)
-                        bl_image = bpy.data.images.new(name=t.name, width=w, height=h)
-                        bl_image.pixels = raw  # type: ignore
-                        bl_image.update()
-                        textures.append(bl_image)
-                    except RuntimeError:
-                        textures.append(None)
+        # embedded images are decoded while creating the scene
+        from . import image_loader
+
+        decoding = image_loader.load_async(
+            [
+                (t.data.mime, t.data.data)
+                for t in loader.textures
+                if isinstance(t.data, gltf.TextureData)
+            ]
+        )
 
         # create materials
+        texture_nodes: list[tuple[bpy.types.ShaderNodeTexImage, int]] = []
         for m in loader.materials:
             material = bpy.data.materials.new(m.name)
             material.use_nodes = True
             tree = material.node_tree
 
-            build_unlit_shader(
-                tree, textures[m.color_texture] if m.color_texture != None else None
-            )
+            texture_node = build_unlit_shader(tree, m.color_texture != None)
+            if texture_node and m.color_texture != None:
+                texture_nodes.append((texture_node, m.color_texture))
             # todo unlit and color texture
             self.materials.append(material)
 
-        # create object for each node
+        # apply conversion to vertices and nodes before creating objects
+        gltf.coordinate.convert_scene(loader.roots, self.conversion)
+
+        # create object for each node that has a mesh in the descendants.
+        # joints are created as bones
+        mesh_trees: set[int] = set()
+        for root in loader.roots:
+            self._find_mesh_trees(root, mesh_trees)
         roots: list[bpy.types.Object] = []
         for root in loader.roots:
-            bl_obj = self._create_tree(root)
-            roots.append(bl_obj)
-
-        # apply conversion
-        self._apply_conversion(roots)
+            if id(root) in mesh_trees:
+                roots.append(self._create_tree(root, mesh_trees))
 
         if loader.vrm:
             # single skin humanoid model
@@ -136,10 +145,6 @@ class Importer:
             if o.type == "MESH" and n.skin:
                 self._setup_skinning(n)
 
-        # remove empties
-        for root in loader.roots:
-            self._remove_empty(root)
-
         for node in loader.nodes:
             if node.humanoid_bone:
                 prop_name = humanoid_properties.prop_from_vrm(node.humanoid_bone)
@@ -151,12 +156,61 @@ class Importer:
                 else:
                     print(f"{node.name} ({node.humanoid_bone}) not found")
 
+        # set decoded images to the materials
+        textures = self._create_images(loader.textures, decoding)
+        for texture_node, texture_index in texture_nodes:
+            bl_image = textures[texture_index]
+            if bl_image:
+                texture_node.image = bl_image
+            else:
+                texture_node.id_data.nodes.remove(texture_node)
+
+    def _create_images(
+        self,
+        textures: list[gltf.Texture],
+        decoding: list[Future[tuple[int, int, numpy.ndarray]]],
+    ) -> list[bpy.types.Image | None]:
+        decoded = iter(decoding)
+        bl_images: list[bpy.types.Image | None] = []
+        for t in textures:
+            match t.data:
+                case pathlib.Path():
+                    if t.data.exists():
+                        bl_image = bpy.data.images.load(
+                            str(t.data), check_existing=True
+                        )
+                    else:
+                        print(f"{t.data} not exists")
+                        bl_image = bpy.data.images.new(t.data.name, width=2, height=2)
+                    bl_images.append(bl_image)
+                case gltf.TextureData():
+                    try:
+                        w, h, pixels = next(decoded).result()
+                        bl_image = bpy.data.images.new(name=t.name, width=w, height=h)
+                        bl_image.pixels.foreach_set(pixels)
+                        bl_image.update()
+                        bl_images.append(bl_image)
+                    except (RuntimeError, OSError) as e:
+                        print(f"{t.name}: {e}")
+                        bl_images.append(None)
+        return bl_images
+
+    def _find_mesh_trees(self, node: gltf.Node, mesh_trees: set[int]) -> bool:
+        has_mesh = node.mesh is not None
+        for child in node.children:
+            if self._find_mesh_trees(child, mesh_trees):
+                has_mesh = True
+        if has_mesh:
+            mesh_trees.add(id(node))
+        return has_mesh
+
     def _create_tree(
-        self, node: gltf.Node, parent: gltf.Node | None = None, level: int = 0
+        self, node: gltf.Node, mesh_trees: set[int], level: int = 0
     ) -> bpy.types.Object:
         bl_obj = self._create_object(node)
         for child in node.children:
-            self._create_tree(child, node, level + 1)
+            if id(child) in mesh_trees:
+                self._create_tree(child, mesh_trees, level + 1)
         return bl_obj
 
     def _create_object(self, node: gltf.Node) -> bpy.types.Object:
@@ -198,9 +252,11 @@ class Importer:
         if node.parent:
             bl_obj.parent = self.obj_map[node.parent]
 
-        # TRS
+        # TRS. same as the bone heads
         bl_obj.location = node.translation
-        bl_obj.rotation_quaternion = node.rotation
+        bl_obj.rotation_mode = "QUATERNION"
+        x, y, z, w = node.rotation
+        bl_obj.rotation_quaternion = (w, x, y, z)
         bl_obj.scale = node.scale
 
         return bl_obj
@@ -210,6 +266,13 @@ class Importer:
         Armature for Humanoid
         """
         skins = [node.skin for root in roots for node in root.traverse() if node.skin]
+        joints: dict[int, gltf.Node] = {}
+        for skin in skins:
+            for node in skin.joints:
+                joints.setdefault(id(node), node)
+        # armature local. heads and tails before entering edit mode
+        layout = layout_bones(list(joints.values()))
+
         # create new node
         bl_skin = bpy.data.armatures.new("Humanoid")
         bl_skin.use_mirror_x = True
@@ -225,27 +288,24 @@ class Importer:
         bl_obj.select_set(True)
         bpy.ops.object.mode_set(mode="EDIT", toggle=False)
 
-        # 1st pass: create bones
-        bones: dict[gltf.Node, bpy.types.EditBone] = {}
-        for skin in skins:
-            for node in skin.joints:
-                if node in bones:
-                    continue
-                bl_object = self.obj_map.get(node)
-                if not bl_object:
-                    # maybe removed as empty leaf
-                    continue
-                bl_bone = bl_skin.edit_bones.new(node.name)
-                # get armature local matrix
-                bl_bone.head = bl_object.matrix_world.translation
-                bl_bone.tail = bl_bone.head + mathutils.Vector((0, 0.1, 0))
-                bones[node] = bl_bone
-
-        # 2nd pass: tail, connect
-        connect_bones(bones)
+        # create bones
+        bones: list[bpy.types.EditBone] = []
+        for node, head, tail in zip(
+            layout.nodes, layout.heads.tolist(), layout.tails.tolist()
+        ):
+            bl_bone = bl_skin.edit_bones.new(node.name)
+            bl_bone.head = head
+            bl_bone.tail = tail
+            bones.append(bl_bone)
+        for bl_bone, parent, use_connect in zip(
+            bones, layout.parents.tolist(), layout.use_connect.tolist()
+        ):
+            if parent >= 0:
+                bl_bone.parent = bones[parent]
+                bl_bone.use_connect = use_connect
 
         humaniod_map: dict[human_bones.HumanoidBones, gltf.Node] = {}
-        for k, _ in bones.items():
+        for k in layout.nodes:
             if k.humanoid_bone:
                 humaniod_map[k.humanoid_bone] = k
 
@@ -319,69 +379,8 @@ class Importer:
             return
 
         print(f"skinning: {bl_object}")
-        vert_idx = [0]
-
-        # for sm in mesh_node.mesh.submeshes:
-        #     assert sm.vertices.JOINTS_0
-        #     j = sm.vertices.JOINTS_0()
-        #     assert sm.vertices.WEIGHTS_0
-        #     w = sm.vertices.WEIGHTS_0()
-        # set_skinning(mesh_node.mesh.boneweights)
         if mesh_node.mesh.boneweights:
-            for v in mesh_node.mesh.boneweights:
-                if v.weights.x > 0:
-                    set_bone_weight(
-                        bl_object, vert_idx[0], bone_names[int(v.joints.x)], v.weights.x
-                    )
-                if v.weights.y > 0:
-                    set_bone_weight(
-                        bl_object, vert_idx[0], bone_names[int(v.joints.y)], v.weights.y
-                    )
-                if v.weights.z > 0:
-                    set_bone_weight(
-                        bl_object, vert_idx[0], bone_names[int(v.joints.z)], v.weights.z
-                    )
-                if v.weights.w > 0:
-                    set_bone_weight(
-                        bl_object, vert_idx[0], bone_names[int(v.joints.w)], v.weights.w
-                    )
-                vert_idx[0] += 1
+            set_bone_weights(bl_object, bone_names, mesh_node.mesh.boneweights)
 
         modifier = bl_object.modifiers.new(name="Armature", type="ARMATURE")
         modifier.object = self.skin_map.get(skin)
-
-    def _apply_conversion(self, roots: list[bpy.types.Object]):
-        empty = bpy.data.objects.new("empty", None)
-        self.collection.objects.link(empty)
-        for bl_obj in roots:
-            bl_obj.parent = empty
-        convert_obj(self.conversion.src, self.conversion.dst, empty)
-
-        def apply(o: bpy.types.Object):
-            o.select_set(True)
-            bpy.ops.object.transform_apply(location=False, rotation=True, scale=False)
-            o.select_set(False)
-
-        bpy.ops.object.select_all(action="DESELECT")
-        bl_traverse(empty, apply)
-        empty.select_set(True)
-        bpy.ops.object.delete(use_global=False)
-
-    def _remove_empty(self, node: gltf.Node):
-        """
-        深さ優先で、深いところから順に削除する
-        """
-        for i in range(len(node.children) - 1, -1, -1):
-            child = node.children[i]
-            self._remove_empty(child)
-
-        if node.children:
-            return
-        if node.mesh:
-            return
-
-        # remove empty
-        bl_obj = self.obj_map[node]
-        bpy.data.objects.remove(bl_obj, do_unlink=True)
-        if node.parent:
-            node.parent.children.remove(node)
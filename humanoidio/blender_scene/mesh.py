@@ -1,7 +1,6 @@
 import bpy
 import ctypes
-import mathutils  # type: ignore
-import bmesh  # type: ignore
+import numpy
 from .. import gltf
 
 
@@ -9,72 +8,73 @@ UV_LAYER_NAME = "texcoord0"
 DEFORM_LAYER_NAME = "deform0"
 
 
-def create_vertices(bm: bmesh.types.BMesh, vertices: ctypes.Array[gltf.Vertex]):
-
-    for v in vertices:
-        # position
-        vert = bm.verts.new((v.position.x, v.position.y, v.position.z))
-        # normal
-        vert.normal = mathutils.Vector((v.normal.x, v.normal.y, v.normal.z))
-
-
-def create_face(
-    bm: bmesh.types.BMesh, indices: ctypes.Array[ctypes.c_uint16], submesh: gltf.Submesh
-):
-    for i in range(submesh.index_offset, submesh.index_offset + submesh.index_count, 3):
-        i0 = indices[i]
-        i1 = indices[i + 1]
-        i2 = indices[i + 2]
-        v0 = bm.verts[i0]
-        v1 = bm.verts[i1]
-        v2 = bm.verts[i2]
-        try:
-            face = bm.faces.new((v0, v1, v2))
-            face.smooth = True  # use vertex normal
-            face.material_index = submesh.material_index
-        except ValueError as e:
-            print(e)
-
-
-def get_or_create_uv_layer(bm: bmesh.types.BMesh) -> bmesh.types.BMLayerItem:
-    if UV_LAYER_NAME in bm.loops.layers.uv:
-        return bm.loops.layers.uv[UV_LAYER_NAME]
-    return bm.loops.layers.uv.new(UV_LAYER_NAME)
-
-
-def set_uv(bm: bmesh.types.BMesh, vertices: ctypes.Array[gltf.Vertex]):
-    uv_layer = get_or_create_uv_layer(bm)
-    for face in bm.faces:
-        for loop in face.loops:
-            uv = vertices[loop.vert.index].uv
-            loop[uv_layer].uv = (uv.x, uv.y)
-
-    # # Set morph target positions (no normals/tangents)
-    # for target in mesh.morphtargets:
-
-    #     layer = bm.verts.layers.shape.new(target.name)
-
-    #     for i, vert in enumerate(bm.verts):
-    #         p = target.attributes.position[i]
-    #         vert[layer] = mathutils.Vector(yup2zup(p)) + vert.co
+def get_vertex_arrays(
+    vertices: ctypes.Array[gltf.Vertex],
+) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """
+    positions (n, 3), normals (n, 3), uvs (n, 2)
+    """
+    data = numpy.frombuffer(vertices, numpy.float32).reshape(len(vertices), 8)
+    return data[:, 0:3], data[:, 3:6], data[:, 6:8]
+
+
+def get_triangles(
+    indices: ctypes.Array[ctypes.c_uint16] | ctypes.Array[ctypes.c_int],
+    submeshes: list[gltf.Submesh],
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    triangles (n, 3) and material index of each.
+
+    triangles that bmesh.faces.new rejects, degenerate or duplicated, are removed.
+    """
+    all_indices = numpy.ctypeslib.as_array(indices).astype(numpy.int32)
+    triangles: list[numpy.ndarray] = []
+    materials: list[numpy.ndarray] = []
+    for sm in submeshes:
+        t = all_indices[sm.index_offset : sm.index_offset + sm.index_count]
+        t = t[: len(t) // 3 * 3].reshape(-1, 3)
+        triangles.append(t)
+        materials.append(numpy.full(len(t), sm.material_index, numpy.int32))
+    if not triangles:
+        return numpy.empty((0, 3), numpy.int32), numpy.empty(0, numpy.int32)
+    triangle_array = numpy.concatenate(triangles)
+    material_array = numpy.concatenate(materials)
+
+    t = numpy.sort(triangle_array, axis=1)
+    valid = (t[:, 0] != t[:, 1]) & (t[:, 1] != t[:, 2])
+    # first of the faces that have the same vertices
+    _, first = numpy.unique(t, axis=0, return_index=True)
+    unique = numpy.zeros(len(t), bool)
+    unique[first] = True
+    keep = valid & unique
+    if not keep.all():
+        print(f"remove {len(keep) - keep.sum()} invalid triangles")
+    return triangle_array[keep], material_array[keep]
 
 
 def create_mesh(bl_mesh: bpy.types.Mesh, mesh: gltf.Mesh):
-    # create an empty BMesh
-    bm = bmesh.new()
+    positions, normals, uvs = get_vertex_arrays(mesh.vertices)
+    triangles, material_indices = get_triangles(mesh.indices, mesh.submeshes)
+    loops = triangles.reshape(-1)
 
     # vertices
-    create_vertices(bm, mesh.vertices)
-
-    bm.verts.ensure_lookup_table()
-    bm.verts.index_update()
+    bl_mesh.vertices.add(len(positions))
+    bl_mesh.vertices.foreach_set("co", positions.reshape(-1))
 
     # triangles
-    for sm in mesh.submeshes:
-        create_face(bm, mesh.indices, sm)
+    bl_mesh.loops.add(len(loops))
+    bl_mesh.loops.foreach_set("vertex_index", loops)
+    bl_mesh.polygons.add(len(triangles))
+    bl_mesh.polygons.foreach_set(
+        "loop_start", numpy.arange(0, len(loops), 3, dtype=numpy.int32)
+    )
+    bl_mesh.polygons.foreach_set("material_index", material_indices)
+    # use vertex normal
+    bl_mesh.polygons.foreach_set("use_smooth", numpy.ones(len(triangles), bool))
 
     # loop layer
-    set_uv(bm, mesh.vertices)
+    uv_layer = bl_mesh.uv_layers.new(name=UV_LAYER_NAME)
+    uv_layer.data.foreach_set("uv", uvs[loops].reshape(-1))
 
-    bm.to_mesh(bl_mesh)
-    bm.free()
+    bl_mesh.update()
+    bl_mesh.normals_split_custom_set_from_vertices(normals)
@@ -28,17 +28,16 @@ class BlenderObjectScanner:
         for t0, t1, t2 in triangles:
             buffer.indices[i] = t0.vert.index
             buffer.loop_normals[i] = vector2float3(t0.calc_normal())
-            buffer.check_normal(i)
             i += 1
             buffer.indices[i] = t1.vert.index
             buffer.loop_normals[i] = vector2float3(t1.calc_normal())
-            buffer.check_normal(i)
             i += 1
             buffer.indices[i] = t2.vert.index
             buffer.loop_normals[i] = vector2float3(t2.calc_normal())
-            buffer.check_normal(i)
             i += 1
 
+        buffer.check_normals()
+
         return buffer
 
     def _export_object(self, bl_obj: bpy.types.Object):
@@ -2,7 +2,7 @@ from .node import Node, Skin, RotationConstraint
 from .loader import load, Mesh, Submesh, Loader
 from .coordinate import Coordinate, Conversion
 from .types import Float2, Float3, Float4, Vertex, Bdef4
-from .exporter import AnimationChannelTargetPath, Animation
+from .exporter import AnimationChannelTargetPath, Animation, BakedAnimation
 from .. import human_bones
 from .material import Material, Texture, TextureData
 
@@ -18,6 +18,7 @@ __all__ = [
     "Conversion",
     "AnimationChannelTargetPath",
     "Animation",
+    "BakedAnimation",
     "human_bones",
     "Material",
     "Texture",
@@ -1,7 +1,9 @@
 from typing import Iterable, Iterator, Any, TypeVar, Callable, Type
 import ctypes
 import array
+import hashlib
 from enum import IntEnum
+import numpy
 from .types import Float2, Float3, Float4
 from . import gltf_json_type
 
@@ -108,6 +110,30 @@ TYPE_SIZE_MAP: dict[str, int] = {
 }
 
 
+CT_DTYPE_MAP: dict[ComponentType, type] = {
+    ComponentType.Int8: numpy.int8,
+    ComponentType.UInt8: numpy.uint8,
+    ComponentType.Int16: numpy.int16,
+    ComponentType.UInt16: numpy.uint16,
+    ComponentType.UInt32: numpy.uint32,
+    ComponentType.Float: numpy.float32,
+}
+
+
+def get_min_max(
+    values: Any, t: ComponentType, c: str
+) -> tuple[list[float], list[float]]:
+    """
+    min and max of each component. values is any buffer(ctypes.Array, array.array,
+    memoryview, numpy.ndarray)
+    """
+    data = numpy.frombuffer(memoryview(values).cast("B"), CT_DTYPE_MAP[t])
+    data = data.reshape(-1, TYPE_SIZE_MAP[c])
+    if len(data) == 0:
+        return [], []
+    return data.min(axis=0).tolist(), data.max(axis=0).tolist()
+
+
 def get_size_count(accessor: gltf_json_type.Accessor) -> tuple[int, int]:
     ct = accessor["componentType"]
     t = accessor["type"]
@@ -143,7 +169,17 @@ class GltfAccessor:
     images: list[gltf_json_type.Image]
     bin: bytes
 
-    def __init__(self, gltf: gltf_json_type.glTF, bin: bytes | bytearray | None):
+    def __init__(
+        self,
+        gltf: gltf_json_type.glTF,
+        bin: bytes | bytearray | None,
+        dedup: bool = False,
+    ):
+        """
+        dedup: push_bytes returns the existing bufferView for identical data
+        """
+        # sha256 of data => bufferView index
+        self._view_map: dict[bytes, int] | None = {} if dedup else None
         match bin:
             case bytes():
                 self.bin = bin
@@ -269,17 +305,26 @@ class GltfAccessor:
     def push_bytes(self, data: bytes | memoryview) -> int:
         if self._write_buffer == None:
             raise Exception("not writable")
+        if self._view_map is not None:
+            digest = hashlib.sha256(data).digest()
+            if digest in self._view_map:
+                return self._view_map[digest]
+            self._view_map[digest] = len(self.bufferViews)
+        # 4 byte alignment
+        padding = -len(self._write_buffer) % 4
+        if padding:
+            self._write_buffer.extend(bytes(padding))
         bufferView_index = len(self.bufferViews)
         bufferView: gltf_json_type.BufferView = {
             "buffer": 0,
-            "byteOffset": len(self.bin),
+            "byteOffset": len(self._write_buffer),
             "byteLength": len(data),
         }
         self._write_buffer.extend(data)
         self.bufferViews.append(bufferView)
         return bufferView_index
 
-    def push_array(self, values: Any, min_max: Any = None) -> int:
+    def push_array(self, values: Any, min_max: bool = False) -> int:
         accessor_index = len(self.accessors)
         t, c = get_type_count(values)
         accessor: gltf_json_type.Accessor = {  # type: ignore
@@ -288,12 +333,35 @@ class GltfAccessor:
             "componentType": t.value,
             "count": len(values),
         }
-        if min_max:
-            c = min_max()
-            for v in values:
-                c.push(v)
-            accessor["min"] = c.min
-            accessor["max"] = c.max
+        if min_max and len(values):
+            accessor["min"], accessor["max"] = get_min_max(values, t, c)
 
         self.accessors.append(accessor)
         return accessor_index
+
+    def push_view_accessor(
+        self,
+        bufferView: int,
+        t: ComponentType,
+        c: str,
+        count: int,
+        byteOffset: int = 0,
+        min: list[float] | None = None,
+        max: list[float] | None = None,
+    ) -> int:
+        """
+        accessor to a part of an existing bufferView
+        """
+        accessor_index = len(self.accessors)
+        accessor: gltf_json_type.Accessor = {  # type: ignore
+            "bufferView": bufferView,
+            "byteOffset": byteOffset,
+            "type": c,
+            "componentType": t.value,
+            "count": count,
+        }
+        if min is not None and max is not None:
+            accessor["min"] = min
+            accessor["max"] = max
+        self.accessors.append(accessor)
+        return accessor_index
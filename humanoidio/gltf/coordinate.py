@@ -1,5 +1,9 @@
-from typing import NamedTuple, Iterable, Iterator, Callable
+from typing import NamedTuple
 from enum import IntEnum, auto
+import functools
+import numpy
+from .node import Node
+from .mesh import Mesh
 
 
 class Coordinate(IntEnum):
@@ -35,90 +39,109 @@ class Coordinate(IntEnum):
     UNITY = LH_XYZ_right_up_forward
 
 
-def yup2zup_turn(
-    iterable: Iterable[float],
-) -> Callable[[], Iterator[tuple[float, float, float]]]:
-    def g():
-        it = iter(iterable)
-        while True:
-            try:
-                _0 = next(it)
-                _1 = next(it)
-                _2 = next(it)
-                yield (-_0, _2, _1)
-            except StopIteration:
-                break
-
-    return g
-
-
-def yup2zup(
-    iterable: Iterable[float],
-) -> Callable[[], Iterator[tuple[float, float, float]]]:
-    def g():
-        it = iter(iterable)
-        while True:
-            try:
-                _0 = next(it)
-                _1 = next(it)
-                _2 = next(it)
-                yield (_0, -_2, _1)
-            except StopIteration:
-                break
-
-    return g
+# semantic axes (right, up, forward) = BASIS[coordinate] @ (x, y, z)
+BASIS: dict[Coordinate, tuple[tuple[int, int, int], ...]] = {
+    Coordinate.RH_XYZ_left_up_forward: ((-1, 0, 0), (0, 1, 0), (0, 0, 1)),
+    Coordinate.RH_XYZ_right_up_backward: ((1, 0, 0), (0, 1, 0), (0, 0, -1)),
+    Coordinate.RH_XYZ_right_forward_up: ((1, 0, 0), (0, 0, 1), (0, 1, 0)),
+    Coordinate.RH_XYZ_left_backword_up: ((-1, 0, 0), (0, 0, 1), (0, -1, 0)),
+    Coordinate.LH_XYZ_right_up_forward: ((1, 0, 0), (0, 1, 0), (0, 0, 1)),
+}
+
+
+@functools.cache
+def get_basis(src: Coordinate, dst: Coordinate) -> tuple[numpy.ndarray, bool]:
+    """
+    3x3 matrix from src to dst(dst = matrix @ src) and whether the handedness
+    flips
+    """
+    src_basis = numpy.array(BASIS[src], numpy.float32)
+    dst_basis = numpy.array(BASIS[dst], numpy.float32)
+    # orthonormal. inverse is transpose
+    matrix = dst_basis.T @ src_basis
+    matrix.flags.writeable = False
+    return matrix, bool(numpy.linalg.det(matrix) < 0)
 
 
 class Conversion(NamedTuple):
     src: Coordinate
     dst: Coordinate
 
-    def generator(
-        self, span: Iterable[float]
-    ) -> Callable[[], Iterator[tuple[float, float, float]]]:
-        if self.dst == Coordinate.BLENDER:
-            # [blender]
-            # Z  Y
-            # | /
-            # +--X
-            if self.src == Coordinate.GLTF:
-                # [glTF, VRM1]
-                #    Y  Z
-                #    | /
-                # X--+
-                return yup2zup_turn(span)
-            elif self.src == Coordinate.VRM0:
-                # [VRM0]
-                #    Y
-                #    |
-                #    +--X
-                #   /
-                # Z
-                return yup2zup(span)
-            else:
-                raise NotImplementedError()
-        elif self.dst == Coordinate.BLENDER_ROTATE:
-            # [blender]
-            #    z
-            #    |
-            # X--+
-            #   /
-            # y
-            if self.src == Coordinate.GLTF:
-                # [glTF, VRM1]
-                #    Y  Z
-                #    | /
-                # X--+
-                return yup2zup(span)
-            elif self.src == Coordinate.VRM0:
-                # [VRM0]
-                #    Y
-                #    |
-                #    +--X
-                #   /
-                # Z
-                return yup2zup_turn(span)
-            else:
-                raise NotImplementedError()
-        else:
-            raise NotImplementedError()
+    @property
+    def matrix(self) -> numpy.ndarray:
+        """
+        3x3. dst = matrix @ src
+        """
+        return get_basis(self.src, self.dst)[0]
+
+    @property
+    def flip(self) -> bool:
+        """
+        left handed <=> right handed
+        """
+        return get_basis(self.src, self.dst)[1]
+
+    def convert_positions(self, values: numpy.ndarray) -> None:
+        """
+        (n, 3) in place. also for normals
+        """
+        values[:] = values @ self.matrix.T
+
+    def convert_scales(self, values: numpy.ndarray) -> None:
+        """
+        (n, 3) in place
+        """
+        values[:] = values @ numpy.abs(self.matrix.T)
+
+    def convert_rotations(self, values: numpy.ndarray) -> None:
+        """
+        (n, 4) x, y, z, w quaternions in place. the axis is a pseudovector
+        """
+        values[:, 0:3] = values[:, 0:3] @ self.matrix.T
+        if self.flip:
+            values[:, 0:3] *= -1
+
+    def convert_indices(self, values: numpy.ndarray) -> None:
+        """
+        (n, 3) triangles in place. winding is reversed when the handedness flips
+        """
+        if self.flip:
+            values[:, [1, 2]] = values[:, [2, 1]]
+
+
+def convert_scene(roots: list[Node], conversion: Conversion) -> None:
+    """
+    convert vertices and node transforms in place. before creating bpy objects
+    """
+    nodes = [node for root in roots for node in root.traverse()]
+
+    # each mesh once
+    meshes: dict[int, Mesh] = {}
+    for node in nodes:
+        if isinstance(node.mesh, Mesh):
+            meshes[id(node.mesh)] = node.mesh
+    for mesh in meshes.values():
+        # position, normal, uv
+        vertices = numpy.frombuffer(mesh.vertices, numpy.float32).reshape(-1, 8)
+        conversion.convert_positions(vertices[:, 0:3])
+        conversion.convert_positions(vertices[:, 3:6])
+        if conversion.flip:
+            indices = numpy.ctypeslib.as_array(mesh.indices)
+            conversion.convert_indices(indices[: len(indices) // 3 * 3].reshape(-1, 3))
+
+    if not nodes:
+        return
+    translations = numpy.array([node.translation for node in nodes], numpy.float64)
+    rotations = numpy.array([node.rotation for node in nodes], numpy.float64)
+    scales = numpy.array([node.scale for node in nodes], numpy.float64)
+    conversion.convert_positions(translations)
+    conversion.convert_rotations(rotations)
+    conversion.convert_scales(scales)
+    for node, t, r, s in zip(
+        nodes, translations.tolist(), rotations.tolist(), scales.tolist()
+    ):
+        node.translation = tuple(t)
+        node.rotation = tuple(r)
+        node.scale = tuple(s)
+    for root in roots:
+        root.update_world_position()
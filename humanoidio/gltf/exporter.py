@@ -1,9 +1,12 @@
 from typing import NamedTuple, Iterator, MutableSequence
 from enum import Enum, auto
 import ctypes
+import array
+import numpy
 from . import gltf_json_type
 from . import glb
 from . import accessor_util
+from . import keyframe
 from .node import Node
 from .mesh import ExportMesh
 from .types import Float3, Float4
@@ -51,45 +54,30 @@ class Animation(NamedTuple):
     node: int
     target_path: AnimationChannelTargetPath
     times: MutableSequence[float]
-    values: ctypes.Array[Float4]
-
-
-class PostionMinMax:
-    def __init__(self):
-        self.min = [float("inf"), float("inf"), float("inf")]
-        self.max = [-float("inf"), -float("inf"), -float("inf")]
-
-    def push(self, v: Float3):
-        # min
-        if v.x < self.min[0]:
-            self.min[0] = v.x
-        if v.y < self.min[1]:
-            self.min[1] = v.y
-        if v.z < self.min[2]:
-            self.min[2] = v.z
-        # max
-        if v.x > self.max[0]:
-            self.max[0] = v.x
-        if v.y > self.max[1]:
-            self.max[1] = v.y
-        if v.z > self.max[2]:
-            self.max[2] = v.z
-
-
-class FloatMinMax:
-    def __init__(self):
-        self.min = [float("inf")]
-        self.max = [-float("inf")]
-
-    def push(self, v: float):
-        if v < self.min[0]:
-            self.min[0] = v
-        if v > self.max[0]:
-            self.max[0] = v
+    values: ctypes.Array[Float3] | ctypes.Array[Float4]
+
+
+class BakedAnimation(NamedTuple):
+    """
+    channels resampled on one time grid.
+    """
+
+    action_name: str
+    # (frames,) seconds
+    times: numpy.ndarray
+    rotation_nodes: list[int]
+    # (len(rotation_nodes), frames, 4) float32
+    rotations: numpy.ndarray
+    translation_nodes: list[int]
+    # (len(translation_nodes), frames, 3) float32
+    translations: numpy.ndarray
 
 
 class GltfWriter:
-    def __init__(self):
+    def __init__(self, dedup: bool = False):
+        """
+        dedup: identical data shares a bufferView
+        """
         self.gltf: gltf_json_type.glTF = {
             "asset": {
                 "version": "2.0",
@@ -101,7 +89,10 @@ class GltfWriter:
             "nodes": [],
             "scenes": [],
         }
-        self.accessor = accessor_util.GltfAccessor(self.gltf, bytearray())
+        self.bin = bytearray()
+        self.accessor = accessor_util.GltfAccessor(self.gltf, self.bin, dedup)
+        # id(Node) => node index
+        self.node_indices: dict[int, int] = {}
 
     def push_mesh(self, mesh: ExportMesh):
         if mesh.normal_splitted:
@@ -110,7 +101,7 @@ class GltfWriter:
         gltf_mesh: gltf_json_type.Mesh = {"primitives": []}
         primitive: gltf_json_type.MeshPrimitive = {"attributes": {}}
         primitive["attributes"]["POSITION"] = self.accessor.push_array(
-            mesh.POSITION, PostionMinMax
+            mesh.POSITION, min_max=True
         )
         primitive["attributes"]["NORMAL"] = self.accessor.push_array(mesh.NORMAL)
         primitive["indices"] = self.accessor.push_array(mesh.indices)
@@ -129,6 +120,7 @@ class GltfWriter:
         self.gltf["nodes"] = nodes
         node_index = len(nodes)
         nodes.append(gltf_node)
+        self.node_indices[id(node)] = node_index
 
         # TODO: TRS
         if node.translation != (0, 0, 0):
@@ -170,16 +162,49 @@ class GltfWriter:
         self.gltf["scenes"] = scenes
         scenes.append(scene)
 
-    def push_animation(self, animation: Animation, fps: float):
+    def push_animation(
+        self,
+        animation: Animation,
+        fps: float,
+        tolerance: keyframe.Tolerance | None = None,
+    ):
+        """
+        tolerance: drop keyframes that the neighbours interpolate within it
+        """
         if "animations" not in self.gltf:
             self.gltf["animations"] = []
 
         inv = 1 / fps
-        for i, _ in enumerate(animation.times):
-            animation.times[i] = animation.times[i] * inv
-
-        time_accessor = self.accessor.push_array(animation.times, FloatMinMax)
-        values_accessor = self.accessor.push_array(animation.values)
+        times = array.array("f", [t * inv for t in animation.times])
+        values = animation.values
+
+        if tolerance and len(times) > 2:
+            np_times = numpy.frombuffer(times, numpy.float32)
+            np_values = numpy.frombuffer(values, numpy.float32).reshape(
+                1, len(times), -1
+            )
+            match animation.target_path:
+                case AnimationChannelTargetPath.rotation:
+                    (keys,) = keyframe.reduce_channels(
+                        np_times, np_values, tolerance.rotation, True
+                    )
+                case AnimationChannelTargetPath.translation:
+                    (keys,) = keyframe.reduce_channels(
+                        np_times, np_values, tolerance.translation, False
+                    )
+                case AnimationChannelTargetPath.scale:
+                    (keys,) = keyframe.reduce_channels(
+                        np_times, np_values, tolerance.scale, False
+                    )
+                case _:
+                    keys = numpy.arange(len(times))
+            times = array.array("f", np_times[keys].tobytes())
+            values = (values._type_ * len(keys)).from_buffer_copy(
+                np_values[0, keys].tobytes()
+            )
+
+        time_accessor = self.accessor.push_array(times, min_max=True)
+        values_accessor = self.accessor.push_array(values)
 
         gltf_animation: gltf_json_type.Animation = {  # type: ignore
             "name": animation.action_name,
@@ -202,13 +227,133 @@ class GltfWriter:
         }
         self.gltf["animations"].append(gltf_animation)
 
-    def to_gltf(self) -> tuple[gltf_json_type.glTF, bytes]:
-        self.gltf["buffers"] = [{"byteLength": len(self.accessor.bin)}]
+    def _push_packed(
+        self, arrays: list[numpy.ndarray], c: str, min_max: bool = False
+    ) -> list[int]:
+        """
+        float arrays as one bufferView. an accessor for each
+        """
+        if not arrays:
+            return []
+        data = numpy.concatenate(
+            [numpy.asarray(a, numpy.float32).reshape(len(a), -1) for a in arrays]
+        )
+        view = self.accessor.push_bytes(memoryview(data).cast("B"))
+        stride = data.shape[1] * 4
+        accessors: list[int] = []
+        offset = 0
+        for a in arrays:
+            min, max = None, None
+            if min_max and len(a):
+                min, max = accessor_util.get_min_max(
+                    data[offset : offset + len(a)], accessor_util.ComponentType.Float, c
+                )
+            accessors.append(
+                self.accessor.push_view_accessor(
+                    view,
+                    accessor_util.ComponentType.Float,
+                    c,
+                    len(a),
+                    offset * stride,
+                    min=min,
+                    max=max,
+                )
+            )
+            offset += len(a)
+        return accessors
+
+    def push_baked_animation(
+        self,
+        animation: BakedAnimation,
+        tolerance: keyframe.Tolerance | None = None,
+    ):
+        """
+        rotations and translations are each written as one bufferView.
+
+        without tolerance, one input accessor is shared by all samplers.
+        with tolerance, each channel is reduced and channels that keep the same
+        keyframes share an input accessor.
+        """
+        if "animations" not in self.gltf:
+            self.gltf["animations"] = []
+
+        times = numpy.asarray(animation.times, numpy.float32)
+        rotations = numpy.asarray(animation.rotations, numpy.float32)
+        translations = numpy.asarray(animation.translations, numpy.float32)
+
+        if tolerance:
+            rotation_keys = keyframe.reduce_channels(
+                times, rotations, tolerance.rotation, True
+            )
+            translation_keys = keyframe.reduce_channels(
+                times, translations, tolerance.translation, False
+            )
+        else:
+            all_keys = numpy.arange(len(times))
+            rotation_keys = [all_keys] * len(rotations)
+            translation_keys = [all_keys] * len(translations)
+
+        # input accessor for each distinct keyframe set
+        key_sets: dict[bytes, int] = {}
+        unique_keys: list[numpy.ndarray] = []
+        for keys in rotation_keys + translation_keys:
+            if keys.tobytes() not in key_sets:
+                key_sets[keys.tobytes()] = len(unique_keys)
+                unique_keys.append(keys)
+        time_accessors = self._push_packed(
+            [times[keys] for keys in unique_keys], "SCALAR", True
+        )
+
+        gltf_animation: gltf_json_type.Animation = {  # type: ignore
+            "name": animation.action_name,
+            "samplers": [],
+            "channels": [],
+        }
+        for path, nodes, keys_list, accessors in (
+            (
+                AnimationChannelTargetPath.rotation,
+                animation.rotation_nodes,
+                rotation_keys,
+                self._push_packed(
+                    [v[keys] for v, keys in zip(rotations, rotation_keys)], "VEC4"
+                ),
+            ),
+            (
+                AnimationChannelTargetPath.translation,
+                animation.translation_nodes,
+                translation_keys,
+                self._push_packed(
+                    [v[keys] for v, keys in zip(translations, translation_keys)],
+                    "VEC3",
+                ),
+            ),
+        ):
+            for node, keys, values_accessor in zip(nodes, keys_list, accessors):
+                gltf_animation["channels"].append(
+                    {
+                        "sampler": len(gltf_animation["samplers"]),
+                        "target": {"node": node, "path": path.name},
+                    }
+                )
+                gltf_animation["samplers"].append(
+                    {
+                        "input": time_accessors[key_sets[keys.tobytes()]],
+                        "interpolation": "LINEAR",
+                        "output": values_accessor,
+                    }
+                )
+        self.gltf["animations"].append(gltf_animation)
+
+    def to_gltf(self) -> tuple[gltf_json_type.glTF, bytearray]:
+        """
+        bin is the buffer of the writer. not copied
+        """
+        self.gltf["buffers"] = [{"byteLength": len(self.bin)}]
 
         # update extensions used
         self.gltf["extensionsUsed"] = [x for x in enum_extensions_unique(self.gltf)]  # type: ignore
 
-        return self.gltf, bytes(self.accessor.bin)
+        return self.gltf, self.bin
 
     def to_glb(self) -> bytes:
         gltf, bin = self.to_gltf()
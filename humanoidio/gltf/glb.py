@@ -1,5 +1,5 @@
+from typing import BinaryIO
 import json
-import io
 from . import gltf_json_type
 
 
@@ -70,37 +70,63 @@ def get_padding_size(body_size: int):
     return body_size_padding
 
 
-def write_chunk(bs: io.IOBase, magic: bytes, body: bytes):
-    body_size = len(body)
-    body_size_padding = get_padding_size(body_size)
-    body_size += body_size_padding
+Body = bytes | bytearray | memoryview
 
-    bs.write(int.to_bytes(body_size, length=4, byteorder="little"))
+
+def body_size(body: Body) -> int:
+    return memoryview(body).nbytes
+
+
+def write_chunk(bs: BinaryIO, magic: bytes, body: Body, fill: bytes = b" "):
+    """
+    body is written as is. no copy
+    """
+    size = body_size(body)
+    padding = get_padding_size(size)
+
+    bs.write(int.to_bytes(size + padding, length=4, byteorder="little"))
     bs.write(magic)
     bs.write(body)
-    for _ in range(body_size_padding):
-        bs.write(b" ")
+    if padding:
+        bs.write(fill * padding)
 
 
-def chunk_size_with_padding(b: bytes):
-    return 8 + len(b) + get_padding_size(len(b))
+def chunk_size_with_padding(b: Body):
+    size = body_size(b)
+    return 8 + size + get_padding_size(size)
 
 
-def to_glb(gltf: gltf_json_type.glTF, bin: bytes):
+def write_glb(bs: BinaryIO, json_body: bytes, bin: Body) -> int:
     """
-    each chunk must has 4byte alignment
+    stream header, JSON chunk and BIN chunk. returns the file size.
+
+    JSON is padded with spaces and BIN with zeros.
     """
+    size = 12 + chunk_size_with_padding(json_body) + chunk_size_with_padding(bin)
+    # header
+    bs.write(GLB_MAGIC)
+    bs.write(GLB_VERSION)
+    bs.write(int.to_bytes(size, length=4, byteorder="little"))
+
+    write_chunk(bs, JSON_CHUNK_MAGIC, json_body)
+    write_chunk(bs, BIN_CHUNK_MAGIC, bin, b"\0")
+    return size
+
 
-    with io.BytesIO() as bs:
-        json_body = json.dumps(gltf).encode("utf-8")
+class _Parts:
+    def __init__(self):
+        self.parts: list[Body] = []
 
-        # header
-        bs.write(GLB_MAGIC)
-        bs.write(GLB_VERSION)
-        size = 12 + chunk_size_with_padding(json_body) + chunk_size_with_padding(bin)
-        bs.write(int.to_bytes(size, length=4, byteorder="little"))
+    def write(self, b: Body):
+        self.parts.append(b)
 
-        write_chunk(bs, JSON_CHUNK_MAGIC, json_body)
-        write_chunk(bs, BIN_CHUNK_MAGIC, bin)
 
-        return bs.getvalue()
+def to_glb(gltf: gltf_json_type.glTF, bin: Body) -> bytes:
+    """
+    each chunk must has 4byte alignment
+    """
+    json_body = json.dumps(gltf).encode("utf-8")
+    # join the parts into the result without an intermediate buffer
+    parts = _Parts()
+    write_glb(parts, json_body, bin)  # type: ignore
+    return b"".join(parts.parts)
@@ -0,0 +1,147 @@
+"""
+keyframe reduction.
+
+Douglas-Peucker over each channel. a keyframe is kept when the curve between
+the kept neighbours differs from it more than the tolerance. all segments of
+all channels are processed at once, one subdivision level per iteration.
+"""
+
+from typing import NamedTuple, Callable
+import math
+import numpy
+
+
+class Tolerance(NamedTuple):
+    # radians
+    rotation: float = math.radians(0.5)
+    translation: float = 1e-4
+    scale: float = 1e-4
+
+
+def lerp(v0: numpy.ndarray, v1: numpy.ndarray, t: numpy.ndarray) -> numpy.ndarray:
+    return v0 + (v1 - v0) * t[:, None]
+
+
+def slerp(q0: numpy.ndarray, q1: numpy.ndarray, t: numpy.ndarray) -> numpy.ndarray:
+    """
+    (n, 4), (n, 4), (n,) to (n, 4)
+    """
+    d = numpy.einsum("ij,ij->i", q0, q1)
+    # shortest path
+    q1 = numpy.where((d < 0)[:, None], -q1, q1)
+    theta = numpy.arccos(numpy.clip(numpy.abs(d), 0.0, 1.0))
+    sin_theta = numpy.sin(theta)
+    near = sin_theta < 1e-6
+    safe = numpy.where(near, 1.0, sin_theta)
+    w0 = numpy.where(near, 1 - t, numpy.sin((1 - t) * theta) / safe)
+    w1 = numpy.where(near, t, numpy.sin(t * theta) / safe)
+    q = q0 * w0[:, None] + q1 * w1[:, None]
+    return q / numpy.linalg.norm(q, axis=1, keepdims=True)
+
+
+def distance_error(approx: numpy.ndarray, values: numpy.ndarray) -> numpy.ndarray:
+    return numpy.linalg.norm(approx - values, axis=1)
+
+
+def angle_error(approx: numpy.ndarray, values: numpy.ndarray) -> numpy.ndarray:
+    """
+    rotation angle between two quaternions
+    """
+    values = values / numpy.linalg.norm(values, axis=1, keepdims=True)
+    d = numpy.abs(numpy.einsum("ij,ij->i", approx, values))
+    return 2 * numpy.arccos(numpy.clip(d, 0.0, 1.0))
+
+
+def douglas_peucker(
+    times: numpy.ndarray,
+    values: numpy.ndarray,
+    starts: numpy.ndarray,
+    ends: numpy.ndarray,
+    tolerance: float,
+    interpolate: Callable[[numpy.ndarray, numpy.ndarray, numpy.ndarray], numpy.ndarray],
+    error: Callable[[numpy.ndarray, numpy.ndarray], numpy.ndarray],
+) -> numpy.ndarray:
+    """
+    times (n,), values (n, components). starts and ends are the first and last
+    keyframe of each channel in them. returns the keep mask (n,).
+    """
+    times = numpy.asarray(times, numpy.float64)
+    values = numpy.asarray(values, numpy.float64)
+    keep = numpy.zeros(len(times), bool)
+    keep[starts] = True
+    keep[ends] = True
+
+    seg_begin = numpy.asarray(starts, numpy.int64)
+    seg_end = numpy.asarray(ends, numpy.int64)
+    while True:
+        interior = seg_end - seg_begin - 1
+        has_interior = interior > 0
+        seg_begin = seg_begin[has_interior]
+        seg_end = seg_end[has_interior]
+        interior = interior[has_interior]
+        if len(seg_begin) == 0:
+            break
+
+        # interior keyframes of every segment
+        segment = numpy.repeat(numpy.arange(len(seg_begin)), interior)
+        first = numpy.cumsum(interior) - interior
+        index = (
+            seg_begin[segment]
+            + 1
+            + numpy.arange(len(segment))
+            - numpy.repeat(first, interior)
+        )
+
+        i0 = seg_begin[segment]
+        i1 = seg_end[segment]
+        length = times[i1] - times[i0]
+        t = numpy.where(
+            length > 0,
+            (times[index] - times[i0]) / numpy.where(length > 0, length, 1),
+            0,
+        )
+        err = error(interpolate(values[i0], values[i1], t), values[index])
+
+        seg_max = numpy.maximum.reduceat(err, first)
+        split = seg_max > tolerance
+        if not split.any():
+            break
+
+        # first keyframe with the max error in each split segment
+        candidates = numpy.flatnonzero((err == seg_max[segment]) & split[segment])
+        _, pick = numpy.unique(segment[candidates], return_index=True)
+        pivot = index[candidates[pick]]
+        keep[pivot] = True
+
+        seg_begin, seg_end = (
+            numpy.concatenate([seg_begin[split], pivot]),
+            numpy.concatenate([pivot, seg_end[split]]),
+        )
+
+    return keep
+
+
+def reduce_channels(
+    times: numpy.ndarray,
+    values: numpy.ndarray,
+    tolerance: float,
+    is_rotation: bool,
+) -> list[numpy.ndarray]:
+    """
+    times (frames,), values (channels, frames, components).
+    returns kept keyframe indices of each channel.
+    """
+    channels, frames = values.shape[:2]
+    if channels == 0 or frames == 0:
+        return [numpy.arange(frames) for _ in range(channels)]
+    starts = numpy.arange(channels) * frames
+    keep = douglas_peucker(
+        numpy.tile(times, channels),
+        values.reshape(channels * frames, -1),
+        starts,
+        starts + frames - 1,
+        tolerance,
+        slerp if is_rotation else lerp,
+        angle_error if is_rotation else distance_error,
+    ).reshape(channels, frames)
+    return [numpy.flatnonzero(row) for row in keep]
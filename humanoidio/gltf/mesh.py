@@ -2,6 +2,7 @@ from typing import Callable, Iterator, Any
 from .types import Float3, Vertex, Bdef4
 import ctypes
 import dataclasses
+import numpy
 
 
 # class VertexBuffer:
@@ -101,6 +102,13 @@ class Mesh:
         return hash(self.name)
 
 
+def _float_view(values: ctypes.Array[Float3]) -> numpy.ndarray:
+    """
+    writable (n, 3) view of a Float3 array
+    """
+    return numpy.frombuffer(values, numpy.float32).reshape(-1, 3)
+
+
 class ExportMesh:
     def __init__(self, vertex_count: int, index_count: int):
         self.POSITION = (Float3 * vertex_count)()
@@ -109,38 +117,45 @@ class ExportMesh:
         self.loop_normals = (Float3 * index_count)()
         self.normal_splitted = False
 
-    def check_normal(self, i: int):
-        if self.normal_splitted:
+    def check_normals(self):
+        """
+        normal_splitted if any loop normal differs from its vertex normal
+        """
+        if len(self.indices) == 0:
+            self.normal_splitted = False
             return
-        if self.NORMAL[self.indices[i]] != self.loop_normals[i]:
-            l = self.NORMAL[self.indices[i]]
-            l = (l.x, l.y, l.z)
-            r = self.loop_normals[i]
-            r = (r.x, r.y, r.z)
-            self.normal_splitted = True
+        indices = numpy.frombuffer(self.indices, numpy.uint32)
+        self.normal_splitted = bool(
+            (_float_view(self.NORMAL)[indices] != _float_view(self.loop_normals)).any()
+        )
 
     def split(self) -> "ExportMesh":
-        vertices: list[
-            tuple[tuple[float, float, float], tuple[float, float, float]]
-        ] = []
-        vertex_map: dict[tuple[float, float, float, float, float, float], int] = {}
-        indices: list[int] = []
-        for i, n in zip(self.indices, self.loop_normals):
-            p = self.POSITION[i]
-            key = (p.x, p.y, p.z, n.x, n.y, n.z)
-            if key in vertex_map:
-                index = vertex_map[key]
-            else:
-                index = len(vertices)
-                vertices.append((p, n))
-                vertex_map[key] = index
-            indices.append(index)
+        """
+        a vertex for each unique (position, normal) in first appearance order
+        """
+        indices = numpy.frombuffer(self.indices, numpy.uint32)
+        # + 0.0: -0.0 to 0.0 to compare by bytes
+        packed = numpy.ascontiguousarray(
+            numpy.concatenate(
+                [_float_view(self.POSITION)[indices], _float_view(self.loop_normals)],
+                axis=1,
+            )
+            + numpy.float32(0.0)
+        )
+        keys = packed.view(numpy.dtype((numpy.void, packed.dtype.itemsize * 6)))[:, 0]
+        _, first, inverse = numpy.unique(keys, return_index=True, return_inverse=True)
+
+        # sorted order to first appearance order
+        order = numpy.argsort(first)
+        rank = numpy.empty_like(order)
+        rank[order] = numpy.arange(len(order))
+        vertices = packed[first[order]]
 
         splitted = ExportMesh(len(vertices), len(indices))
-        for i, (v, n) in enumerate(vertices):
-            splitted.POSITION[i] = v
-            splitted.NORMAL[i] = n
-        for i, index in enumerate(indices):
-            splitted.indices[i] = index
+        _float_view(splitted.POSITION)[:] = vertices[:, :3]
+        _float_view(splitted.NORMAL)[:] = vertices[:, 3:]
+        new_indices = rank[inverse.reshape(-1)]
+        numpy.frombuffer(splitted.indices, numpy.uint32)[:] = new_indices
+        _float_view(splitted.loop_normals)[:] = vertices[new_indices, 3:]
 
         return splitted
@@ -1,6 +1,7 @@
 import pathlib
 from .pmd import load_pmd, gltf_from_pmd
 from .pmx import load_pmx, gltf_from_pmx
+from .vmd import load_vmd, bake_vmd, vmd_to_glb
 from ..gltf.loader import Loader
 
 
@@ -9,6 +10,9 @@ __all__ = [
     "gltf_from_pmd",
     "load_pmx",
     "gltf_from_pmx",
+    "load_vmd",
+    "bake_vmd",
+    "vmd_to_glb",
 ]
 
 
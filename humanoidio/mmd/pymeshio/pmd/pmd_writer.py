@@ -4,21 +4,87 @@ pmd writer
 """
 import io
 import struct
+import numpy
 from .. import common
 from . import pmd_format
 
+# packed(no padding) section layouts
+VERTEX_DTYPE = numpy.dtype(
+    [
+        ("pos", "<f4", 3),
+        ("normal", "<f4", 3),
+        ("uv", "<f4", 2),
+        ("bone0", "<u2"),
+        ("bone1", "<u2"),
+        ("weight0", "u1"),
+        ("edge_flag", "u1"),
+    ]
+)
+assert VERTEX_DTYPE.itemsize == 38
+
+MATERIAL_DTYPE = numpy.dtype(
+    [
+        ("diffuse_color", "<f4", 3),
+        ("alpha", "<f4"),
+        ("specular_factor", "<f4"),
+        ("specular_color", "<f4", 3),
+        ("ambient_color", "<f4", 3),
+        ("toon_index", "u1"),
+        ("edge_flag", "u1"),
+        ("vertex_count", "<u4"),
+        ("texture_file", "S20"),
+    ]
+)
+assert MATERIAL_DTYPE.itemsize == 70
+
+BONE_DTYPE = numpy.dtype(
+    [
+        ("name", "S20"),
+        ("parent_index", "<u2"),
+        ("tail_index", "<u2"),
+        ("type", "u1"),
+        ("ik_index", "<u2"),
+        ("pos", "<f4", 3),
+    ]
+)
+assert BONE_DTYPE.itemsize == 39
+
+MORPH_VERTEX_DTYPE = numpy.dtype(
+    [
+        ("index", "<u4"),
+        ("pos", "<f4", 3),
+    ]
+)
+assert MORPH_VERTEX_DTYPE.itemsize == 16
+
+
+def _uint_array(values: list[int], dtype: str) -> numpy.ndarray:
+    """
+    -1 wraps to the max value like BinaryWriter.write_uint
+    """
+    return numpy.array(values, numpy.int64).astype(dtype)
+
+
+def _float_array(values: list[tuple[float, ...]], n: int) -> numpy.ndarray:
+    return numpy.array(values, numpy.float32).reshape(-1, n)
+
+
+def _rgb(c: common.RGB) -> tuple[float, float, float]:
+    return (c.r, c.g, c.b)
+
 
 class PmdWriter(common.BinaryWriter):
     def write_veritices(self, vertices: list[pmd_format.Vertex]) -> None:
         self.write_uint(len(vertices), 4)
-        for v in vertices:
-            self.write_vector3(v.pos)
-            self.write_vector3(v.normal)
-            self.write_vector2(v.uv)
-            self.write_uint(v.bone0, 2)
-            self.write_uint(v.bone1, 2)
-            self.write_uint(v.weight0, 1)
-            self.write_uint(v.edge_flag, 1)
+        a = numpy.empty(len(vertices), VERTEX_DTYPE)
+        a["pos"] = _float_array([v.pos.to_tuple() for v in vertices], 3)
+        a["normal"] = _float_array([v.normal.to_tuple() for v in vertices], 3)
+        a["uv"] = _float_array([v.uv.to_tuple() for v in vertices], 2)
+        a["bone0"] = _uint_array([v.bone0 for v in vertices], "u2")
+        a["bone1"] = _uint_array([v.bone1 for v in vertices], "u2")
+        a["weight0"] = _uint_array([v.weight0 for v in vertices], "u1")
+        a["edge_flag"] = _uint_array([v.edge_flag for v in vertices], "u1")
+        self.ios.write(a.tobytes())
 
     def write_indices(self, indices: list[int]) -> None:
         self.write_uint(len(indices), 4)
@@ -26,28 +92,30 @@ class PmdWriter(common.BinaryWriter):
 
     def write_materials(self, materials: list[pmd_format.Material]) -> None:
         self.write_uint(len(materials), 4)
-        for m in materials:
-            self.write_rgb(m.diffuse_color)
-            self.write_float(m.alpha)
-            self.write_float(m.specular_factor)
-            self.write_rgb(m.specular_color)
-            self.write_rgb(m.ambient_color)
-            self.write_uint(m.toon_index, 1)
-            self.write_uint(m.edge_flag, 1)
-            self.write_uint(m.vertex_count, 4)
-            self.write_bytes(m.texture_file.encode("cp932"), 20)
+        a = numpy.empty(len(materials), MATERIAL_DTYPE)
+        a["diffuse_color"] = _float_array([_rgb(m.diffuse_color) for m in materials], 3)
+        a["alpha"] = [m.alpha for m in materials]
+        a["specular_factor"] = [m.specular_factor for m in materials]
+        a["specular_color"] = _float_array(
+            [_rgb(m.specular_color) for m in materials], 3
+        )
+        a["ambient_color"] = _float_array([_rgb(m.ambient_color) for m in materials], 3)
+        a["toon_index"] = _uint_array([m.toon_index for m in materials], "u1")
+        a["edge_flag"] = _uint_array([m.edge_flag for m in materials], "u1")
+        a["vertex_count"] = _uint_array([m.vertex_count for m in materials], "u4")
+        a["texture_file"] = [m.texture_file.encode("cp932") for m in materials]
+        self.ios.write(a.tobytes())
 
     def write_bones(self, bones: list[pmd_format.Bone]) -> None:
         self.write_uint(len(bones), 2)
-        sBone = struct.Struct("=20sHHBH3f")
-        assert sBone.size == 39
-        for b in bones:
-            self.write_bytes(b.name.encode("cp932"), 20)
-            self.write_uint(b.parent_index, 2)
-            self.write_uint(b.tail_index, 2)
-            self.write_uint(b.type, 1)
-            self.write_uint(b.ik_index, 2)
-            self.write_vector3(b.pos)
+        a = numpy.empty(len(bones), BONE_DTYPE)
+        a["name"] = [b.name.encode("cp932") for b in bones]
+        a["parent_index"] = _uint_array([b.parent_index for b in bones], "u2")
+        a["tail_index"] = _uint_array([b.tail_index for b in bones], "u2")
+        a["type"] = _uint_array([b.type for b in bones], "u1")
+        a["ik_index"] = _uint_array([b.ik_index for b in bones], "u2")
+        a["pos"] = _float_array([b.pos.to_tuple() for b in bones], 3)
+        self.ios.write(a.tobytes())
 
     def write_ik_list(self, ik_list: list[pmd_format.IK]) -> None:
         self.write_uint(len(ik_list), 2)
@@ -65,9 +133,10 @@ class PmdWriter(common.BinaryWriter):
             self.write_bytes(morph.name.encode("cp932"), 20)
             self.write_uint(len(morph.indices), 4)
             self.write_uint(morph.type, 1)
-            for i, v in zip(morph.indices, morph.pos_list):
-                self.write_uint(i, 4)
-                self.write_vector3(v)
+            a = numpy.empty(len(morph.indices), MORPH_VERTEX_DTYPE)
+            a["index"] = _uint_array(morph.indices, "u4")
+            a["pos"] = _float_array([v.to_tuple() for v in morph.pos_list], 3)
+            self.ios.write(a.tobytes())
 
     def write_morph_indices(self, morph_indices: list[int]) -> None:
         self.write_uint(len(morph_indices), 1)
@@ -80,9 +149,10 @@ class PmdWriter(common.BinaryWriter):
 
     def write_bone_display_list(self, bone_display_list: list[tuple[int, int]]) -> None:
         self.write_uint(len(bone_display_list), 4)
-        for l in bone_display_list:
-            self.write_uint(l[0], 2)
-            self.write_uint(l[1], 1)
+        a = numpy.empty(len(bone_display_list), "<u2, u1")
+        a["f0"] = [l[0] for l in bone_display_list]
+        a["f1"] = [l[1] for l in bone_display_list]
+        self.ios.write(a.tobytes())
 
     def write_rigidbodies(self, rigidbodies: list[pmd_format.RigidBody]) -> None:
         self.write_uint(len(rigidbodies), 4)
@@ -152,8 +222,11 @@ def write(ios: io.IOBase, src: pmd_format.Pmd) -> None:
     writer.write_uint(1, 1)
     writer.write_bytes(src.english_name.encode("cp932"), 20)
     writer.write_bytes(src.english_comment.encode("cp932"), 256)
-    for bone in src.bones:
-        writer.write_bytes(bone.english_name.encode("cp932"), 20)
+    writer.write_bytes(
+        numpy.array(
+            [bone.english_name.encode("cp932") for bone in src.bones], "S20"
+        ).tobytes()
+    )
     for skin in src.morphs:
         if skin.name == "base":
             continue
@@ -4,90 +4,144 @@ VMDの読み込み
  * http://blog.goo.ne.jp/torisu_tetosuki/e/bc9f1c4d597341b394bd02b64597499d
  * http://yumin3123.at.webry.info/200810/article_4.html
  * http://atupdate.web.fc2.com/vmd_format.htm
-"""
-__author__="ousttrue"
-__license__="zlib"
-__versioon__="1.0.0"
-
-
-import io
-import os
-import struct
-from .. import common
 
+keyframes are kept columnar. each section is a numpy structured array that
+has the same layout as the file.
+"""
 
-class MorphFrame(object):
+__author__ = "ousttrue"
+__license__ = "zlib"
+__versioon__ = "1.0.0"
+
+import dataclasses
+import numpy
+
+# フレームひとつ分(111 bytes)
+BONE_FRAME_DTYPE = numpy.dtype(
+    [
+        ("name", "S15"),
+        ("frame", "<u4"),
+        ("position", "<f4", 3),
+        # x, y, z, w
+        ("rotation", "<f4", 4),
+        # raw interpolation bytes. see sampler
+        ("interpolation", "u1", 64),
+    ]
+)
+assert BONE_FRAME_DTYPE.itemsize == 111
+
+# モーフデータひとつ分(23 bytes)
+MORPH_FRAME_DTYPE = numpy.dtype(
+    [
+        ("name", "S15"),
+        ("frame", "<u4"),
+        ("weight", "<f4"),
+    ]
+)
+assert MORPH_FRAME_DTYPE.itemsize == 23
+
+# カメラデータひとつ分(61 bytes)
+CAMERA_FRAME_DTYPE = numpy.dtype(
+    [
+        ("frame", "<u4"),
+        ("length", "<f4"),
+        ("position", "<f4", 3),
+        ("euler", "<f4", 3),
+        ("interpolation", "u1", 24),
+        ("angle", "<u4"),
+        # 0: on, 1: off
+        ("perspective", "u1"),
+    ]
+)
+assert CAMERA_FRAME_DTYPE.itemsize == 61
+
+# 照明データひとつ分(28 bytes)
+LIGHT_FRAME_DTYPE = numpy.dtype(
+    [
+        ("frame", "<u4"),
+        ("color", "<f4", 3),
+        ("position", "<f4", 3),
+    ]
+)
+assert LIGHT_FRAME_DTYPE.itemsize == 28
+
+
+@dataclasses.dataclass
+class BoneTrack:
     """
-    morphing animation data.
+    keyframes of one bone, sorted by frame.
     """
-    __slots__=['name', 'frame', 'ratio']
-    def __init__(self, name):
-        self.name=name
-        self.frame=-1
-        self.ratio=0
 
-    def __cmp__(self, other):
-        return cmp(self.frame, other.frame)
-
-
-class BoneFrame(object):
-    """
-    bone animation data.
-    """
-    __slots__=['name', 'frame', 'pos', 'q', 'complement']
-    def __init__(self, name):
-        self.name=name
-        self.frame=-1
-        self.pos=common.Vector3()
-        self.q=common.Quaternion()
+    name: str
+    # (n,) uint32
+    frames: numpy.ndarray
+    # (n, 3) float32
+    positions: numpy.ndarray
+    # (n, 4) float32. x, y, z, w
+    rotations: numpy.ndarray
+    # (n, 64) uint8
+    interpolation: numpy.ndarray
 
-    def __cmp__(self, other):
-        return cmp(self.frame, other.frame)
+    def __len__(self) -> int:
+        return len(self.frames)
 
-    def __str__(self):
-        return '<BoneFrame "%s" %d %s%s>' % (self.name, self.frame, self.pos, self.q)
+    def __str__(self) -> str:
+        return '<BoneTrack "%s" %d frames>' % (self.name, len(self))
 
 
-class CameraFrame(object):
+@dataclasses.dataclass
+class MorphTrack:
     """
-    camera animation data.
+    keyframes of one morph, sorted by frame.
     """
-    __slots__=['frame', 'length', 'pos', 'euler', 'complement', 'angle', 'perspective']
-    def __init__(self):
-        self.frame=-1
-        self.length=0
-        self.pos=common.Vector3()
-        self.euler=common.Vector3()
-        self.complement=None
-        self.angle=0
-        self.perspective=True
-
-    def __cmp__(self, other):
-        return cmp(self.frame, other.frame)
-
-    def __str__(self):
-        return '<CameraFrame %d %s%s>' % (self.frame, self.pos, self.euler)
-
-
-class Motion(object):
-    __slots__=[
-            'model_name',
-            'motions',
-            'shapes',
-            'cameras',
-            'lights',
-            'last_frame',
-            ]
-    def __init__(self):
-        self.model_name=''
-        self.motions=[]
-        self.shapes=[]
-        self.cameras=[]
-        self.lights=[]
-        self.last_frame=0
-
-    def __str__(self):
-        return '<VMDLoader model: "%s", motion: %d, shape: %d, camera: %d, light: %d>' % (
-            self.model_name, len(self.motions), len(self.shapes),
-            len(self.cameras), len(self.lights))
 
+    name: str
+    # (n,) uint32
+    frames: numpy.ndarray
+    # (n,) float32
+    weights: numpy.ndarray
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __str__(self) -> str:
+        return '<MorphTrack "%s" %d frames>' % (self.name, len(self))
+
+
+@dataclasses.dataclass
+class Motion:
+    model_name: str = ""
+    bones: dict[str, BoneTrack] = dataclasses.field(default_factory=dict)
+    morphs: dict[str, MorphTrack] = dataclasses.field(default_factory=dict)
+    # CAMERA_FRAME_DTYPE array
+    cameras: numpy.ndarray = dataclasses.field(
+        default_factory=lambda: numpy.empty(0, CAMERA_FRAME_DTYPE)
+    )
+    # LIGHT_FRAME_DTYPE array
+    lights: numpy.ndarray = dataclasses.field(
+        default_factory=lambda: numpy.empty(0, LIGHT_FRAME_DTYPE)
+    )
+
+    @property
+    def last_frame(self) -> int:
+        last = 0
+        for track in self.bones.values():
+            if len(track):
+                last = max(last, int(track.frames[-1]))
+        for track in self.morphs.values():
+            if len(track):
+                last = max(last, int(track.frames[-1]))
+        if len(self.cameras):
+            last = max(last, int(self.cameras["frame"].max()))
+        if len(self.lights):
+            last = max(last, int(self.lights["frame"].max()))
+        return last
+
+    def __str__(self) -> str:
+        return '<VMDLoader model: "%s", bone: %d, morph: %d, camera: %d, light: %d>' % (
+            self.model_name,
+            len(self.bones),
+            len(self.morphs),
+            len(self.cameras),
+            len(self.lights),
+        )
@@ -2,63 +2,66 @@
 """
 vmd reader
 """
+
+from typing import Iterator
 import io
-import struct
+import pathlib
+import numpy
 from .. import common
 from .. import vmd
 
 
+def decode_name(src: bytes) -> str:
+    """cp932 text terminated by \\x00. may be cut in the middle of a character"""
+    pos = src.find(b"\x00")
+    if pos != -1:
+        src = src[:pos]
+    return src.decode("cp932", errors="ignore")
+
+
 class Reader(common.BinaryReader):
-    def read_text(self, size):
-        """read cp932 text
-        """
-        src=self._unpack("%ds" % size, size)
-        assert(type(src)==bytes)
-        pos = src.find(b"\x00")
-        if pos==-1:
-            return src
-        else:
-            return src[:pos]
-
-    def read_bone_frame(self):
-        """
-        フレームひとつ分を読み込む(111 bytes)
-        """
-        frame=vmd.BoneFrame(self.read_text(15))
-        (frame.frame, frame.pos.x, frame.pos.y, frame.pos.z,
-        frame.q.x, frame.q.y, frame.q.z, frame.q.w) = struct.unpack(
-                'I7f', self.ios.read(32))
-        # complement data
-        frame.complement=''.join(
-                ['%x' % x for x in struct.unpack('64B', self.ios.read(64))])
-        return frame
-
-    def read_morph_frame(self):
-        """
-        モーフデータひとつ分を読み込む(23 bytes)
-        """
-        frame=vmd.MorphFrame(self.read_text(15))
-        (frame.frame, frame.ratio)=struct.unpack('If', self.ios.read(8))
-        return frame
+    def read_text(self, size: int) -> str:
+        """read cp932 text"""
+        return decode_name(self.read_bytes(size))
 
-    def read_camera_frame(self):
+    def read_frames(self, dtype: numpy.dtype) -> numpy.ndarray:
         """
-        カメラデータひとつ分を読み込む(61 bytes)
+        count(uint32) and count * dtype.itemsize bytes.
+
+        old files end before the camera or light section.
         """
-        frame=vmd.CameraFrame()
-        (frame.frame, frame.length,
-                frame.pos.x, frame.pos.y, frame.pos.z,
-                frame.euler.x, frame.euler.y, frame.euler.z
-                )=struct.unpack('If3f3f', self.ios.read(32))
-        # complement data
-        frame.complement=''.join(
-                ['%x' % x for x in struct.unpack('24B', self.ios.read(24))])
-        (frame.angle, frame.perspective
-                )=struct.unpack('fB', self.ios.read(5))
-        return frame
-
-
-def read_from_file(path):
+        if self.is_end():
+            return numpy.empty(0, dtype)
+        count = self.read_uint(4)
+        data = self.read_bytes(count * dtype.itemsize)
+        if len(data) != count * dtype.itemsize:
+            raise common.ParseException(
+                f"{count} frames of {dtype.itemsize} bytes: {len(data)} bytes left"
+            )
+        return numpy.frombuffer(data, dtype, count)
+
+
+def split_by_name(frames: numpy.ndarray) -> Iterator[tuple[str, numpy.ndarray]]:
+    """
+    group keyframes by decoded name and sort each group by frame.
+    """
+    if len(frames) == 0:
+        return
+    # bytes after \x00 may be garbage. group after decode
+    raw_names, raw_inverse = numpy.unique(frames["name"], return_inverse=True)
+    names, name_inverse = numpy.unique(
+        [decode_name(bytes(raw)) for raw in raw_names], return_inverse=True
+    )
+    labels = name_inverse[raw_inverse.reshape(-1)]
+    order = numpy.lexsort((frames["frame"], labels))
+    counts = numpy.bincount(labels, minlength=len(names))
+    for name, chunk in zip(
+        names, numpy.split(frames[order], numpy.cumsum(counts)[:-1])
+    ):
+        yield str(name), chunk
+
+
+def read_from_file(_path: str | pathlib.Path) -> vmd.Motion:
     """
     read from file path
 
@@ -71,33 +74,45 @@ def read_from_file(path):
     >>> print(m)
 
     """
-    return read(io.BytesIO(common.readall(path)))
+    match _path:
+        case str():
+            path = pathlib.Path(_path)
+        case pathlib.Path():
+            path = _path
+    return read(io.BytesIO(path.read_bytes()))
 
 
-def read(ios):
-    assert(isinstance(ios, io.IOBase))
-    reader=common.BinaryReader(ios)
+def read(ios: io.IOBase) -> vmd.Motion:
+    assert isinstance(ios, io.IOBase)
+    reader = Reader(ios)
 
-    signature=reader._unpack("30s", 30)
-    version=None
-    if signature[:25] == "Vocaloid Motion Data 0002":
-        version=2
-    elif signature[:25] == "Vocaloid Motion Data file":
-        version=1
+    signature = reader.read_bytes(30)
+    if signature.startswith(b"Vocaloid Motion Data 0002"):
+        name_size = 20
+    elif signature.startswith(b"Vocaloid Motion Data file"):
+        name_size = 10
     else:
-        print("invalid signature", signature)
-        return
+        raise common.ParseException("invalid signature: {0}".format(signature))
 
-    reader=Reader(reader.ios)
-    motion=vmd.Motion()
-    motion.model_name=reader.read_text(20)
-    motion.motions=[reader.read_bone_frame() 
-            for _ in range(reader._unpack('I', 4))]
-    motion.shapes=[reader.read_morph_frame() 
-            for _ in range(reader._unpack('I', 4))]
-    motion.cameras=[reader.read_camera_frame() 
-            for _ in range(reader._unpack('I', 4))]
-    motion.lights=[reader.read_light_frame() 
-            for _ in range(reader._unpack('I', 4))]
-    return motion
+    motion = vmd.Motion()
+    motion.model_name = reader.read_text(name_size)
 
+    for name, chunk in split_by_name(reader.read_frames(vmd.BONE_FRAME_DTYPE)):
+        motion.bones[name] = vmd.BoneTrack(
+            name,
+            chunk["frame"],
+            chunk["position"],
+            chunk["rotation"],
+            chunk["interpolation"],
+        )
+
+    for name, chunk in split_by_name(reader.read_frames(vmd.MORPH_FRAME_DTYPE)):
+        motion.morphs[name] = vmd.MorphTrack(name, chunk["frame"], chunk["weight"])
+
+    cameras = reader.read_frames(vmd.CAMERA_FRAME_DTYPE)
+    motion.cameras = cameras[numpy.argsort(cameras["frame"], kind="stable")]
+
+    lights = reader.read_frames(vmd.LIGHT_FRAME_DTYPE)
+    motion.lights = lights[numpy.argsort(lights["frame"], kind="stable")]
+
+    return motion
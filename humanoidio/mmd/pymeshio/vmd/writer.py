@@ -1,49 +1,74 @@
 # coding: utf-8
 import io
-import struct
+import numpy
 from .. import common
 from .. import vmd
 
-def write(ios, motion):
+
+def bone_frames(motion: vmd.Motion) -> numpy.ndarray:
+    """
+    all bone tracks as one BONE_FRAME_DTYPE array
+    """
+    count = sum(len(track) for track in motion.bones.values())
+    frames = numpy.empty(count, vmd.BONE_FRAME_DTYPE)
+    offset = 0
+    for name, track in motion.bones.items():
+        end = offset + len(track)
+        frames["name"][offset:end] = name.encode("cp932")
+        frames["frame"][offset:end] = track.frames
+        frames["position"][offset:end] = track.positions
+        frames["rotation"][offset:end] = track.rotations
+        frames["interpolation"][offset:end] = track.interpolation
+        offset = end
+    return frames
+
+
+def morph_frames(motion: vmd.Motion) -> numpy.ndarray:
+    """
+    all morph tracks as one MORPH_FRAME_DTYPE array
+    """
+    count = sum(len(track) for track in motion.morphs.values())
+    frames = numpy.empty(count, vmd.MORPH_FRAME_DTYPE)
+    offset = 0
+    for name, track in motion.morphs.items():
+        end = offset + len(track)
+        frames["name"][offset:end] = name.encode("cp932")
+        frames["frame"][offset:end] = track.frames
+        frames["weight"][offset:end] = track.weights
+        offset = end
+    return frames
+
+
+def write(ios: io.IOBase, motion: vmd.Motion) -> bool:
     """
+    write motion to ios.
+
+    :Parameters:
+        ios
+            output stream (in io.IOBase)
+        motion
+            vmd motion
+
+    >>> import pymeshio.vmd.writer
+    >>> pymeshio.vmd.writer.write(io.open('out.vmd', 'wb'), motion)
+
     """
-    assert(isinstance(ios, io.IOBase))
-    assert(isinstance(motion, vmd.Motion))
-    writer=common.BinaryWriter(ios)
+    assert isinstance(ios, io.IOBase)
+    assert isinstance(motion, vmd.Motion)
+    writer = common.BinaryWriter(ios)
 
     # 30 bytes
     writer.write_bytes(b"Vocaloid Motion Data 0002", 30)
     # 20 bytes
-    writer.write_bytes(b"", 20)
-
-    # bone motions
-    print(len(motion.motions))
-    writer.write_uint(len(motion.motions), 4)
-    for m in motion.motions:
-        """
-        フレームひとつ分(111 bytes)
-        """
-        writer.write_bytes(m.name, 15)
-        writer.write_uint(m.frame, 4)
-        writer.write_float(m.pos.x)
-        writer.write_float(m.pos.y)
-        writer.write_float(m.pos.z)
-        writer.write_float(m.q.x)
-        writer.write_float(m.q.y)
-        writer.write_float(m.q.z)
-        writer.write_float(m.q.w)
-        writer.write_bytes(m.complement, 64)
-
-    # shape motions
-    writer.write_uint(len(motion.shapes), 4)
-    for s in motion.shapes:
-        writer.write_bytes(s.name, 15)
-        writer.write_uint(s.frame, 4)
-        writer.write_float(s.ratio)
-
-    # ToDo
-    writer.write_uint(0, 4)
-    writer.write_uint(0, 4)
+    writer.write_bytes(motion.model_name.encode("cp932"), 20)
 
-    return True
+    for frames in (
+        bone_frames(motion),
+        morph_frames(motion),
+        motion.cameras,
+        motion.lights,
+    ):
+        writer.write_uint(len(frames), 4)
+        writer.write_bytes(frames.tobytes())
 
+    return True
@@ -0,0 +1,153 @@
+"""
+evaluate vmd bone tracks at arbitrary frame times.
+
+interpolation bytes of a keyframe(4 x 16) describe the curve from the previous
+keyframe to the keyframe. for channel c in X, Y, Z, R::
+
+    x1 = interpolation[c]
+    y1 = interpolation[c + 4]
+    x2 = interpolation[c + 8]
+    y2 = interpolation[c + 12]
+
+that are the control points of a cubic bezier from (0, 0) to (127, 127).
+"""
+
+import numpy
+from .pymeshio import vmd
+from ..gltf.keyframe import slerp
+
+NEWTON_ITERATIONS = 8
+
+
+def bezier_control_points(interpolation: numpy.ndarray) -> numpy.ndarray:
+    """
+    (n, 64) uint8 to (n, 4, 4) float. [key, channel(X, Y, Z, R), (x1, y1, x2, y2)]
+    """
+    rows = interpolation[:, :16].astype(numpy.float64) / 127.0
+    return rows.reshape(-1, 4, 4).transpose(0, 2, 1)
+
+
+def evaluate_bezier(
+    x1: numpy.ndarray,
+    y1: numpy.ndarray,
+    x2: numpy.ndarray,
+    y2: numpy.ndarray,
+    x: numpy.ndarray,
+) -> numpy.ndarray:
+    """
+    y of the bezier curve at x. all arguments are the same shape.
+
+    solve x(s) = x by newton's method from s = x. x(s) is monotonic for
+    control points in [0, 1].
+    """
+    # x(s) = ((a * s + b) * s + c) * s
+    c = 3 * x1
+    b = 3 * x2 - 6 * x1
+    a = 1 + 3 * x1 - 3 * x2
+    s = numpy.array(x, numpy.float64)
+    for _ in range(NEWTON_ITERATIONS):
+        f = ((a * s + b) * s + c) * s - x
+        d = (3 * a * s + 2 * b) * s + c
+        s -= f / numpy.where(numpy.abs(d) > 1e-6, d, numpy.inf)
+        numpy.clip(s, 0.0, 1.0, out=s)
+    c = 3 * y1
+    b = 3 * y2 - 6 * y1
+    a = 1 + 3 * y1 - 3 * y2
+    return ((a * s + b) * s + c) * s
+
+
+def is_linear(control_points: numpy.ndarray) -> numpy.ndarray:
+    """
+    (..., 4) control points on the diagonal. y = x without solving
+    """
+    return (control_points[..., 0] == control_points[..., 1]) & (
+        control_points[..., 2] == control_points[..., 3]
+    )
+
+
+class BoneSampler:
+    """
+    all bone tracks concatenated to evaluate them at once.
+
+    >>> sampler = BoneSampler(list(motion.bones.values()))
+    >>> positions, rotations = sampler.sample(numpy.arange(motion.last_frame + 1))
+    """
+
+    def __init__(self, tracks: list[vmd.BoneTrack]):
+        self.names = [track.name for track in tracks]
+        counts = numpy.array([len(track) for track in tracks], numpy.int64)
+        if (counts == 0).any():
+            raise ValueError("empty bone track")
+        self.begin = numpy.concatenate([[0], numpy.cumsum(counts)[:-1]])
+        self.end = self.begin + counts
+
+        def concat(arrays: list[numpy.ndarray], dtype: type) -> numpy.ndarray:
+            if not arrays:
+                return numpy.empty(0, dtype)
+            return numpy.concatenate(arrays).astype(dtype)
+
+        self.frames = concat([track.frames for track in tracks], numpy.float64)
+        self.positions = concat([track.positions for track in tracks], numpy.float64)
+        self.rotations = concat([track.rotations for track in tracks], numpy.float64)
+        self.control_points = bezier_control_points(
+            concat([track.interpolation for track in tracks], numpy.uint8).reshape(
+                -1, 64
+            )
+        )
+        self.linear = is_linear(self.control_points)
+
+        # search key sorted over all tracks: bone * span + frame
+        self.span = (self.frames.max() + 2) if len(self.frames) else 1.0
+        self.keys = (
+            numpy.repeat(numpy.arange(len(tracks)), counts) * self.span + self.frames
+        )
+
+    def sample(self, times: numpy.ndarray) -> tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        times in frame. returns positions (bones, times, 3) and rotations
+        (bones, times, 4)
+        """
+        times = numpy.asarray(times, numpy.float64)
+        bone_count = len(self.names)
+        t = numpy.broadcast_to(times, (bone_count, len(times)))
+        bone = numpy.broadcast_to(
+            numpy.arange(bone_count)[:, None], (bone_count, len(times))
+        )
+        begin = self.begin[bone]
+        end = self.end[bone]
+
+        # keyframe at or before t, clamped in the track
+        query = bone * self.span + numpy.clip(t, -1.0, self.span - 1)
+        prev = numpy.searchsorted(self.keys, query, side="right") - 1
+        prev = numpy.clip(prev, begin, end - 1)
+        following = numpy.minimum(prev + 1, end - 1)
+
+        f0 = self.frames[prev]
+        f1 = self.frames[following]
+        length = f1 - f0
+        x = numpy.where(
+            length > 0, (t - f0) / numpy.where(length > 0, length, 1.0), 0.0
+        )
+        x = numpy.clip(x, 0.0, 1.0)
+
+        # the curve is stored in the next keyframe
+        cp = self.control_points[following]
+        y = numpy.repeat(x[..., None], 4, axis=-1)
+        curved = ~self.linear[following]
+        if curved.any():
+            cp = cp[curved]
+            y[curved] = evaluate_bezier(
+                cp[:, 0], cp[:, 1], cp[:, 2], cp[:, 3], y[curved]
+            )
+
+        p0 = self.positions[prev]
+        p1 = self.positions[following]
+        positions = p0 + (p1 - p0) * y[..., :3]
+
+        rotations = slerp(
+            self.rotations[prev].reshape(-1, 4),
+            self.rotations[following].reshape(-1, 4),
+            y[..., 3].reshape(-1),
+        ).reshape(bone_count, len(times), 4)
+
+        return positions, rotations
@@ -0,0 +1,115 @@
+import io
+import pathlib
+import logging
+import numpy
+from .pymeshio import vmd
+from .pymeshio.vmd import reader as vmd_reader
+from .sampler import BoneSampler
+from .. import gltf
+from ..gltf.exporter import GltfWriter
+from ..gltf.keyframe import Tolerance
+
+LOGGER = logging.getLogger(__name__)
+
+VMD_FPS = 30
+
+
+def vmd_name(name: str) -> str:
+    """
+    vmd stores bone names in 15 bytes
+    """
+    return vmd_reader.decode_name(name.encode("cp932", errors="ignore")[:15])
+
+
+def bake_vmd(
+    motion: vmd.Motion,
+    nodes: list[gltf.Node],
+    fps: float = VMD_FPS,
+    scale: float = 1.59 / 20,
+    name: str = "vmd",
+) -> gltf.BakedAnimation:
+    """
+    resample all bone tracks on one time grid.
+
+    nodes are the rest pose from pmx_to_gltf / pmd_to_gltf. channel node indices
+    are indices of nodes.
+    """
+    node_map = {vmd_name(node.name): i for i, node in enumerate(nodes)}
+    tracks = [
+        track
+        for track in motion.bones.values()
+        if track.name in node_map and len(track)
+    ]
+    for track_name in motion.bones.keys():
+        if track_name not in node_map:
+            LOGGER.debug(f"bone not found: {track_name}")
+
+    step = VMD_FPS / fps
+    frames = numpy.arange(0, motion.last_frame + step * 0.5, step)
+    if not tracks:
+        return gltf.BakedAnimation(
+            name,
+            frames / VMD_FPS,
+            [],
+            numpy.empty((0, len(frames), 4), numpy.float32),
+            [],
+            numpy.empty((0, len(frames), 3), numpy.float32),
+        )
+
+    positions, rotations = BoneSampler(tracks).sample(frames)
+
+    # z:up -y:forward. same as pmx_to_gltf
+    rotations[..., 0:2] *= -1
+    positions[..., 2] *= -1
+    positions *= scale
+
+    # bones that have no translation keep the rest translation
+    moving = [i for i, track in enumerate(tracks) if track.positions.any()]
+    rest = numpy.array(
+        [nodes[node_map[tracks[i].name]].translation for i in moving], numpy.float64
+    ).reshape(-1, 1, 3)
+
+    return gltf.BakedAnimation(
+        name,
+        frames / VMD_FPS,
+        [node_map[track.name] for track in tracks],
+        rotations.astype(numpy.float32),
+        [node_map[tracks[i].name] for i in moving],
+        (positions[moving] + rest).astype(numpy.float32),
+    )
+
+
+def load_vmd(path: pathlib.Path, data: bytes | None = None) -> vmd.Motion:
+    if not data:
+        data = path.read_bytes()
+    return vmd_reader.read(io.BytesIO(data))
+
+
+def vmd_to_glb(
+    motion: vmd.Motion,
+    loader: gltf.Loader,
+    fps: float = VMD_FPS,
+    tolerance: Tolerance | None = None,
+) -> bytes:
+    """
+    skeleton of loader with the baked motion.
+
+    tolerance: reduce keyframes of each channel
+    """
+    writer = GltfWriter()
+    writer.push_scene(loader.roots)
+    animation = bake_vmd(motion, loader.nodes, fps)
+    writer.push_baked_animation(
+        animation._replace(
+            rotation_nodes=[
+                writer.node_indices[id(loader.nodes[i])]
+                for i in animation.rotation_nodes
+            ],
+            translation_nodes=[
+                writer.node_indices[id(loader.nodes[i])]
+                for i in animation.translation_nodes
+            ],
+        ),
+        tolerance,
+    )
+    return writer.to_glb()
@@ -2,7 +2,7 @@ from typing import Literal
 import pathlib
 import bpy
 from bpy_extras.io_utils import ExportHelper
-from bpy.props import StringProperty, BoolProperty  # type: ignore
+from bpy.props import StringProperty, BoolProperty, IntProperty  # type: ignore
 import bl_ui.space_topbar
 
 
@@ -19,6 +19,32 @@ class ExportYUP(bpy.types.Operator, ExportHelper):
         default=True,
     )  # type: ignore
 
+    weld: BoolProperty(
+        name="Weld Vertices",
+        description="Merge vertices that have the same attributes",
+        default=False,
+    )  # type: ignore
+
+    compress_level: IntProperty(
+        name="PNG Compression Level",
+        description="zlib level of embedded png textures",
+        default=9,
+        min=0,
+        max=9,
+    )  # type: ignore
+
+    cache_textures: BoolProperty(
+        name="Cache Textures",
+        description="Reuse png textures encoded by previous exports",
+        default=False,
+    )  # type: ignore
+
+    dedup: BoolProperty(
+        name="Share Identical Buffers",
+        description="Write identical buffer data once",
+        default=False,
+    )  # type: ignore
+
     # ExportHelper mixin class uses this
     filename_ext = ".vrm"
 
@@ -36,7 +62,14 @@ class ExportYUP(bpy.types.Operator, ExportHelper):
 
         from .. import yup
 
-        yup.export(path, self.selectedonly)  # type ignore
+        yup.export(
+            path,
+            self.selectedonly,
+            weld=self.weld,
+            compress_level=self.compress_level,
+            cache_textures=self.cache_textures,
+            dedup=self.dedup,
+        )  # type ignore
 
         return {"FINISHED"}
 
@@ -1,9 +1,10 @@
 import pathlib
 import bpy
-import struct
 from .gltfbuilder import GLTFBuilder
 from .to_gltf import to_gltf
+from .materialstore import DEFAULT_COMPRESS_LEVEL
 from .gltf import GLTF
+from ..gltf import glb
 
 
 def get_objects(selected_only: bool) -> list[bpy.types.Object]:
@@ -13,63 +14,69 @@ def get_objects(selected_only: bool) -> list[bpy.types.Object]:
         return [o for o in bpy.data.scenes[0].objects if not o.parent]
 
 
-def to_bytes(path: pathlib.Path, objects: list[bpy.types.Object]) -> tuple[GLTF, bytes]:
+def to_bytes(
+    path: pathlib.Path,
+    objects: list[bpy.types.Object],
+    weld: bool = False,
+    compress_level: int = DEFAULT_COMPRESS_LEVEL,
+    cache_textures: bool = False,
+    dedup: bool = False,
+) -> tuple[GLTF, bytearray]:
     ext = path.suffix.lower()
 
-    with GLTFBuilder() as builder:
-        builder.export_objects(objects)
+    builder = GLTFBuilder()
+    builder.export_objects(objects)
 
-        #
-        # export
-        #
-        bin_path = path.parent / (path.stem + ".bin")
-        gltf, bin = to_gltf(builder, path, bin_path if ext != ".glb" else None)
-        return gltf, bytes(bin)
+    #
+    # export
+    #
+    bin_path = path.parent / (path.stem + ".bin")
+    return to_gltf(
+        builder,
+        path,
+        bin_path if ext != ".glb" else None,
+        weld=weld,
+        compress_level=compress_level,
+        cache_textures=cache_textures,
+        dedup=dedup,
+    )
 
 
-def export(path: pathlib.Path, selected_only: bool):
+def export(
+    path: pathlib.Path,
+    selected_only: bool,
+    weld: bool = False,
+    compress_level: int = DEFAULT_COMPRESS_LEVEL,
+    cache_textures: bool = False,
+    dedup: bool = False,
+):
     # object mode
     if bpy.context.mode != "OBJECT":
         bpy.ops.object.mode_set(mode="OBJECT", toggle=False)
 
     objects = get_objects(selected_only)
 
-    gltf, bin_bytes = to_bytes(path, objects)
+    gltf, bin = to_bytes(
+        path,
+        objects,
+        weld=weld,
+        compress_level=compress_level,
+        cache_textures=cache_textures,
+        dedup=dedup,
+    )
 
     #
     # write
     #
-    json_bytes = gltf.to_json().encode("utf-8")
-
     ext = path.suffix.lower()
     bin_path = path.parent / (path.stem + ".bin")
     if ext == ".gltf":
-        with path.open("wb") as f:
-            f.write(json_bytes)
+        with path.open("w", encoding="utf-8", newline="") as f:
+            gltf.write_json(f)
         with bin_path.open("wb") as f:
-            f.write(bin_bytes)
+            f.write(bin)
     elif ext == ".glb" or ext == ".vrm":
         with path.open("wb") as f:
-            if len(json_bytes) % 4 != 0:
-                json_padding_size = 4 - len(json_bytes) % 4
-                print(f"add json_padding_size: {json_padding_size}")
-                json_bytes += b" " * json_padding_size
-            json_header = struct.pack(b"I", len(json_bytes)) + b"JSON"
-            bin_header = struct.pack(b"I", len(bin_bytes)) + b"BIN\x00"
-            header = b"glTF" + struct.pack(
-                "II",
-                2,
-                12
-                + len(json_header)
-                + len(json_bytes)
-                + len(bin_header)
-                + len(bin_bytes),
-            )
-            #
-            f.write(header)
-            f.write(json_header)
-            f.write(json_bytes)
-            f.write(bin_header)
-            f.write(bin_bytes)
+            glb.write_glb(f, gltf.to_json().encode("utf-8"), bin)
     else:
         raise NotImplementedError()
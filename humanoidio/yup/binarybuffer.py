@@ -9,10 +9,9 @@ class BinaryBuffer:
 
     def add_values(self, name: str, data: bytes) -> gltf.GLTFBufferView:
         # alignment
-        if len(self.data) % 4 != 0:
-            padding = 4 - len(self.data) % 4
-            for _ in range(padding):
-                self.data.append(0)
+        padding = -len(self.data) % 4
+        if padding:
+            self.data += bytes(padding)
 
         offset = len(self.data)
         self.data += data
@@ -1,14 +1,26 @@
+import hashlib
 from . import gltf
 from .binarybuffer import BinaryBuffer
 
 
 class BufferManager:
-    def __init__(self):
+    def __init__(self, dedup: bool = False):
+        """
+        dedup: identical data shares a bufferView
+        """
         self.views: list[gltf.GLTFBufferView] = []
         self.accessors: list[gltf.GLTFAccessor] = []
         self.buffer = BinaryBuffer(0)
+        # sha256 of data => view index
+        self.view_map: dict[bytes, int] | None = {} if dedup else None
 
     def add_view(self, name: str, data: bytes) -> int:
+        if self.view_map is not None:
+            digest = hashlib.sha256(data).digest()
+            if digest in self.view_map:
+                return self.view_map[digest]
+            self.view_map[digest] = len(self.views)
+
         view_index = len(self.views)
         view = self.buffer.add_values(name, data)
         self.views.append(view)
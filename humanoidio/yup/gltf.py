@@ -1,38 +1,86 @@
-from typing import NamedTuple, List, Dict, Tuple, Optional, Any
+from typing import NamedTuple, List, Dict, Tuple, Optional, Any, Callable, TextIO
 from enum import Enum, auto
 from collections import namedtuple
+from json.encoder import encode_basestring_ascii
 import json
-
-
-class GLTFEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, Enum):
-            return o.value
-        else:
-            return json.JSONEncoder.default(self, o)
-
-
-def recursive_asdict(o):
-    if isinstance(o, tuple) and hasattr(o, "_asdict"):
-        obj = {}
-        for k, v in o._asdict().items():
-            if v is None:
-                # skip
-                continue
-            if isinstance(v, (list, tuple)):
-                if len(v) == 0:
-                    # skip empty list
-                    continue
-            if isinstance(v, dict):
-                if len(v) == 0:
-                    # skip empty list
-                    continue
-            obj[k] = recursive_asdict(v)
-        return obj
+import math
+
+
+Write = Callable[[str], Any]
+
+# NamedTuple type => '"field":' for each field
+_FIELD_KEYS: dict[type, list[str]] = {}
+# Enum member => encoded value
+_ENUM_VALUES: dict[Enum, str] = {}
+
+
+def _write_namedtuple(o: Any, write: Write):
+    t = type(o)
+    keys = _FIELD_KEYS.get(t)
+    if keys is None:
+        keys = [encode_basestring_ascii(f) + ":" for f in t._fields]
+        _FIELD_KEYS[t] = keys
+    write("{")
+    first = True
+    for v, key in zip(o, keys):
+        # skip None, empty list and empty dict
+        if v is None:
+            continue
+        if isinstance(v, (list, tuple, dict)) and len(v) == 0:
+            continue
+        if not first:
+            write(",")
+        first = False
+        write(key)
+        write_json(v, write)
+    write("}")
+
+
+def write_json(o: Any, write: Write):
+    """
+    compact json in one pass. NamedTuple is an object without None or empty fields
+    """
+    if isinstance(o, str):
+        write(encode_basestring_ascii(o))
+    elif o is None:
+        write("null")
+    elif o is True:
+        write("true")
+    elif o is False:
+        write("false")
+    elif isinstance(o, int) and not isinstance(o, Enum):
+        write(int.__repr__(o))
+    elif isinstance(o, float):
+        # NaN and Infinity as json.dumps
+        write(float.__repr__(o) if math.isfinite(o) else json.dumps(o))
+    elif isinstance(o, tuple) and hasattr(o, "_fields"):
+        _write_namedtuple(o, write)
     elif isinstance(o, (list, tuple)):
-        return [recursive_asdict(x) for x in o]
+        write("[")
+        for i, x in enumerate(o):
+            if i:
+                write(",")
+            write_json(x, write)
+        write("]")
+    elif isinstance(o, dict):
+        write("{")
+        for i, (k, v) in enumerate(o.items()):
+            if i:
+                write(",")
+            write(encode_basestring_ascii(str(k)))
+            write(":")
+            write_json(v, write)
+        write("}")
+    elif isinstance(o, Enum):
+        value = _ENUM_VALUES.get(o)
+        if value is None:
+            parts: list[str] = []
+            write_json(o.value, parts.append)
+            value = "".join(parts)
+            _ENUM_VALUES[o] = value
+        write(value)
     else:
-        return o
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
 
 
 class GLTFAsset(NamedTuple):
@@ -277,5 +325,10 @@ class GLTF(NamedTuple):
     skins: List[GLTFSkin] = []
     extensions: dict[str, Any] = {}
 
-    def to_json(self):
-        return json.dumps(recursive_asdict(self), cls=GLTFEncoder, indent=2)
+    def to_json(self) -> str:
+        parts: list[str] = []
+        write_json(self, parts.append)
+        return "".join(parts)
+
+    def write_json(self, f: TextIO):
+        write_json(self, f.write)
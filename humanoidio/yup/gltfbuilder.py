@@ -1,8 +1,9 @@
-from typing import Iterator, Any, cast, Literal, TypedDict
-from contextlib import contextmanager
+from typing import Iterator, Any, cast, TypedDict
+import functools
 
 import bpy
 import mathutils  # type: ignore
+import numpy
 
 from .meshstore import MeshStore, Vector3_from_meshVertex, Vector3
 from . import gltf
@@ -43,63 +44,28 @@ class Skin:
         self.root = root
         self.object = o
 
-
-@contextmanager
-def tmp_active(obj: bpy.types.Object | None = None):
-    active = bpy.context.active_object
-    bpy.context.view_layer.objects.active = obj
-    try:
-        yield
-    finally:
-        bpy.context.view_layer.objects.active = active
-
-
-MODE_MAP: dict[str, str] = {
-    "EDIT_MESH": "EDIT",
-    "EDIT_CURVE": "EDIT",
-    "EDIT_CURVES": "EDIT",
-    "EDIT_SURFACE": "EDIT",
-    "EDIT_TEXT": "EDIT",
-    "EDIT_ARMATURE": "EDIT",
-    "EDIT_METABALL": "EDIT",
-    "EDIT_LATTICE": "EDIT",
-    "EDIT_GREASE_PENCIL": "EDIT",
-    "EDIT_POINT_CLOUD": "EDIT",
-    "PAINT_WEIGHT": "WEIGHT_PAINT",
-    "PAINT_VERTEX": "VERTEX_PAINT",
-    "PAINT_TEXTURE": "TEXTURE_PAINT",
-    "PARTICLE": "PARTICLE_EDIT",
-}
-
-
-@contextmanager
-def tmp_mode(
-    mode: Literal[
-        "OBJECT",
-        "EDIT",
-        "POSE",
-        "SCULPT",
-        "VERTEX_PAINT",
-        "WEIGHT_PAINT",
-        "TEXTURE_PAINT",
-        "PARTICLE_EDIT",
-        "EDIT_GPENCIL",
-        "SCULPT_GPENCIL",
-        "PAINT_GPENCIL",
-        "WEIGHT_GPENCIL",
-        "VERTEX_GPENCIL",
-        "SCULPT_CURVES",
-        "PAINT_GREASE_PENCIL",
-    ],
-    obj: bpy.types.Object | None = None,
-):
-    with tmp_active(obj):
-        last_mode = cast(str, bpy.context.mode)
-        bpy.ops.object.mode_set(mode=mode)
-        try:
-            yield
-        finally:
-            bpy.ops.object.mode_set(mode=MODE_MAP.get(last_mode, last_mode))  # type: ignore
+    @functools.cached_property
+    def joints(self) -> list[Node]:
+        """
+        joint order. traversed once after the hierarchy is built
+        """
+        return [joint for joint in self.root.traverse()]
+
+    def get_inverse_bind_matrices(self) -> numpy.ndarray:
+        """
+        (joints, 4, 4) float32 in glTF(column major) order.
+
+        nodes are exported with translation only, so the rest matrix of a joint
+        is a translation and the inverse is the negated translation
+        """
+        identity = numpy.eye(4, dtype=numpy.float32)
+        inverse = numpy.repeat(identity[None], len(self.joints), axis=0)
+        # column major. translation is the 4th row
+        inverse[:, 3, :3] = [
+            (-joint.position.x, -joint.position.y, -joint.position.z)
+            for joint in self.joints
+        ]
+        return inverse
 
 
 class GLTFBuilder:
@@ -110,22 +76,14 @@ class GLTFBuilder:
         self.nodes: list[Node] = []
         self.root_nodes: list[Node] = []
         self.skins: list[Skin] = []
-
-        self.tmp_objects: list[bpy.types.Object] = []
+        # object to index of the lists above
+        self.node_indices: dict[Node, int] = {}
+        self.mesh_store_indices: dict[MeshStore, int] = {}
+        self.skin_indices: dict[Skin, int] = {}
+        self.store_skins: dict[MeshStore, Skin | None] = {}
 
         self.extensions: dict[str, Any] = {}
 
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exception_type, exception_value, traceback):  # type: ignore
-        for x in self.tmp_objects:
-            mesh = x.data
-            bpy.context.scene.collection.objects.unlink(x)
-            bpy.data.objects.remove(x)
-            if isinstance(mesh, bpy.types.Mesh):
-                bpy.data.meshes.remove(mesh)
-
     def export_objects(self, objects: list[bpy.types.Object]):
         for o in objects:
             root_node = self._export_object(None, o)
@@ -135,14 +93,14 @@ class GLTFBuilder:
         self, parent: Node | None, o: bpy.types.Object, indent: str = ""
     ) -> Node:
         node = Node(o.name, o.matrix_world.to_translation(), parent)
-        self.nodes.append(node)
+        self._add_node(node)
 
         # only mesh
         if o.type == "MESH":
-            new_obj, mesh = self._create_copy(o)
+            mesh = cast(bpy.types.Mesh, o.data)
 
             # apply modifiers
-            for m in new_obj.modifiers:
+            for m in o.modifiers:
                 if m.type == "ARMATURE":
                     # skin
                     node.skin = self._get_or_create_skin(node, m.object)
@@ -153,6 +111,7 @@ class GLTFBuilder:
                 [b.name for b in node.skin.object.data.bones] if node.skin else [],
             )
             node.mesh = self._export_mesh(mesh, o.vertex_groups, bone_names)
+            self.store_skins[node.mesh] = node.skin
 
         elif o.type == "ARMATURE":
             self._get_or_create_skin(node, o)
@@ -165,34 +124,24 @@ class GLTFBuilder:
 
         return node
 
-    def _create_copy(
-        self, o: bpy.types.Object
-    ) -> tuple[bpy.types.Object, bpy.types.Mesh]:
-        new_obj = cast(bpy.types.Object, o.copy())
-        mesh = cast(bpy.types.Mesh, o.data.copy())
-        new_obj.data = mesh
-        bpy.data.scenes[0].collection.objects.link(new_obj)
-
-        self.tmp_objects.append(new_obj)
-
-        with tmp_mode("EDIT", new_obj):
-            bpy.ops.mesh.sort_elements(type="MATERIAL", elements={"FACE"})
-
-        return new_obj, mesh
+    def _add_node(self, node: Node):
+        self.node_indices[node] = len(self.nodes)
+        self.nodes.append(node)
 
     def _export_humanoid(self, humanoid: HumanoidProperties):
+        # first node of each name
+        name_indices: dict[str, int] = {}
+        for i, node in enumerate(self.nodes):
+            name_indices.setdefault(node.name, i)
 
         vrm_bones: dict[str, HumanBone] = {}
         for _, bone_name in humanoid:
             if bone_name:
                 vrm_name = humanoid.vrm_from_name(bone_name)
                 found = False
-                if vrm_name:
-                    for i, node in enumerate(self.nodes):
-                        if node.name == bone_name:
-                            vrm_bones[vrm_name] = {"node": i}
-                            found = True
-                            break
+                if vrm_name and bone_name in name_indices:
+                    vrm_bones[vrm_name] = {"node": name_indices[bone_name]}
+                    found = True
                 print(vrm_name, bone_name, found)
 
         # print(vrm_bones)
@@ -202,7 +151,7 @@ class GLTFBuilder:
         self, parent: Node, matrix_world: mathutils.Matrix, bone: bpy.types.Bone
     ) -> Node:
         node = Node(bone.name, bone.head_local, parent)
-        self.nodes.append(node)
+        self._add_node(node)
 
         for child in bone.children:
             child_node = self._export_bone(node, matrix_world, child)
@@ -218,6 +167,7 @@ class GLTFBuilder:
                 return skin
 
         skin = Skin(node, armature_object)
+        self.skin_indices[skin] = len(self.skins)
         self.skins.append(skin)
 
         armature = armature_object.data
@@ -237,11 +187,9 @@ class GLTFBuilder:
     ) -> MeshStore:
 
         store = MeshStore(mesh, vertex_groups, bone_names)
+        self.mesh_store_indices[store] = len(self.mesh_stores)
         self.mesh_stores.append(store)
         return store
 
     def get_skin_for_store(self, store: MeshStore) -> Skin | None:
-        for node in self.nodes:
-            if node.mesh == store:
-                return node.skin
-        return None
+        return self.store_skins.get(store)
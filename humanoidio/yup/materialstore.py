@@ -1,27 +1,49 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import logging
+import os
+import pathlib
+import struct
+import sys
+import tempfile
+import zlib
+import numpy
 import bpy
 from .buffermanager import BufferManager
 from . import gltf
 
+LOGGER = logging.getLogger(__name__)
 
-def image_to_png(image: bpy.types.Image) -> bytes:
+DEFAULT_COMPRESS_LEVEL = 9
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+
+def read_pixels(image: bpy.types.Image) -> numpy.ndarray:
     """
-    https://blender.stackexchange.com/questions/62072/does-blender-have-a-method-to-a-get-png-formatted-bytearray-for-an-image-via-pyt
+    (height, width, 4) uint8 rgba. top row first
     """
-    import struct
-    import zlib
-
     width = image.size[0]
     height = image.size[1]
-    buf = bytearray([int(p * 255) for p in image.pixels])
+    pixels = numpy.empty(width * height * 4, numpy.float32)
+    image.pixels.foreach_get(pixels)
+    # same as int(p * 255)
+    rgba = (numpy.clip(pixels, 0.0, 1.0) * 255).astype(numpy.uint8)
+    # blender stores the bottom row first
+    return rgba.reshape(height, width, 4)[::-1]
 
-    # reverse the vertical line order and add null bytes at the start
-    width_byte_4 = width * 4
-    raw_data = b"".join(
-        b"\x00" + buf[span : span + width_byte_4]
-        for span in range((height - 1) * width_byte_4, -1, -width_byte_4)
-    )
 
-    def png_pack(png_tag, data):
+def encode_png(rgba: numpy.ndarray, level: int = DEFAULT_COMPRESS_LEVEL) -> bytes:
+    """
+    (height, width, 4) uint8 to png. no bpy access. safe to call from threads
+
+    https://blender.stackexchange.com/questions/62072/does-blender-have-a-method-to-a-get-png-formatted-bytearray-for-an-image-via-pyt
+    """
+    height, width = rgba.shape[:2]
+    # a null filter byte at the start of each row
+    raw_data = numpy.zeros((height, width * 4 + 1), numpy.uint8)
+    raw_data[:, 1:] = rgba.reshape(height, width * 4)
+
+    def png_pack(png_tag: bytes, data: bytes) -> bytes:
         chunk_head = png_tag + data
         return (
             struct.pack("!I", len(data))
@@ -33,15 +55,133 @@ def image_to_png(image: bpy.types.Image) -> bytes:
         [
             b"\x89PNG\r\n\x1a\n",
             png_pack(b"IHDR", struct.pack("!2I5B", width, height, 8, 6, 0, 0, 0)),
-            png_pack(b"IDAT", zlib.compress(raw_data, 9)),
+            png_pack(b"IDAT", zlib.compress(raw_data.tobytes(), level)),
             png_pack(b"IEND", b""),
         ]
     )
     return png_bytes
 
 
+def image_to_png(
+    image: bpy.types.Image, level: int = DEFAULT_COMPRESS_LEVEL
+) -> bytes:
+    return encode_png(read_pixels(image), level)
+
+
+def user_cache_dir() -> pathlib.Path:
+    """
+    per user cache directory of the platform
+    """
+    if sys.platform == "win32":
+        local = os.environ.get("LOCALAPPDATA")
+        base = pathlib.Path(local) if local else pathlib.Path.home() / "AppData/Local"
+    elif sys.platform == "darwin":
+        base = pathlib.Path.home() / "Library/Caches"
+    else:
+        xdg = os.environ.get("XDG_CACHE_HOME")
+        base = pathlib.Path(xdg) if xdg else pathlib.Path.home() / ".cache"
+    return base / "humanoidio"
+
+
+class PngCache:
+    """
+    encoded png on disk. keyed by a hash of the pixels and the encode settings.
+    least recently used files are removed over max_bytes
+    """
+
+    def __init__(self, directory: pathlib.Path, max_bytes: int = DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def default() -> "PngCache":
+        return PngCache(user_cache_dir() / "png")
+
+    @staticmethod
+    def get_key(rgba: numpy.ndarray, level: int) -> str:
+        h = hashlib.sha256()
+        h.update(f"{rgba.shape}:{level}".encode("ascii"))
+        h.update(numpy.ascontiguousarray(rgba).data)
+        return h.hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        path = self.directory / f"{key}.png"
+        try:
+            png = path.read_bytes()
+            # recently used
+            os.utime(path)
+            return png
+        except OSError:
+            return None
+
+    def put(self, key: str, png: bytes):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # atomic. other threads and processes may write the same key
+            f = tempfile.NamedTemporaryFile(
+                dir=self.directory, suffix=".tmp", delete=False
+            )
+            try:
+                with f:
+                    f.write(png)
+                os.replace(f.name, self.directory / f"{key}.png")
+            except BaseException:
+                # disk full or replace failed. do not leave the tmp file
+                os.unlink(f.name)
+                raise
+        except OSError as e:
+            LOGGER.warning(f"png cache: {e}")
+
+    def trim(self):
+        """
+        remove least recently used files until the total size is under max_bytes
+        """
+        try:
+            entries: list[tuple[float, int, pathlib.Path]] = []
+            for path in self.directory.glob("*.png"):
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+        except OSError as e:
+            LOGGER.warning(f"png cache: {e}")
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError as e:
+                LOGGER.warning(f"png cache: {e}")
+
+    def encode(self, rgba: numpy.ndarray, level: int) -> bytes:
+        key = self.get_key(rgba, level)
+        png = self.get(key)
+        if png is None:
+            png = encode_png(rgba, level)
+            self.put(key, png)
+        return png
+
+
 class MaterialStore:
-    def __init__(self):
+    """
+    textures are encoded on a thread pool. call flush_images to add them to the
+    buffer before reading images. with cache, unchanged textures are not encoded
+    again.
+    """
+
+    def __init__(
+        self,
+        compress_level: int = DEFAULT_COMPRESS_LEVEL,
+        max_workers: int | None = None,
+        cache: PngCache | None = None,
+    ):
+        self.compress_level = compress_level
+        self.max_workers = max_workers
+        self.cache = cache
+        self.executor: ThreadPoolExecutor | None = None
+        # name and encoding png for each image
+        self.pending_images: list[tuple[str, Future[bytes]]] = []
         self.images: list[gltf.GLTFImage] = []
         self.samplers: list[gltf.GLTFSampler] = []
         self.textures: list[gltf.GLTFTexture] = []
@@ -59,20 +199,15 @@ class MaterialStore:
         return gltf_texture_index
 
     def add_texture(self, src: bpy.types.Image, buffer: BufferManager):
-        image_index = len(self.images)
+        image_index = len(self.pending_images)
 
         print(f"add_texture: {src.name}")
-        png = image_to_png(src)
-        view_index = buffer.add_view(src.name, png)
-
-        self.images.append(
-            gltf.GLTFImage(
-                name=src.name,
-                uri=None,
-                mimeType=gltf.MimeType.Png,
-                bufferView=view_index,
-            )
-        )
+        # bpy is read on this thread. zlib releases the GIL
+        if not self.executor:
+            self.executor = ThreadPoolExecutor(self.max_workers)
+        encode = self.cache.encode if self.cache else encode_png
+        png = self.executor.submit(encode, read_pixels(src), self.compress_level)
+        self.pending_images.append((src.name, png))
 
         sampler_index = len(self.samplers)
         self.samplers.append(
@@ -87,6 +222,26 @@ class MaterialStore:
         dst = gltf.GLTFTexture(name=src.name, source=image_index, sampler=sampler_index)
         self.textures.append(dst)
 
+    def flush_images(self, buffer: BufferManager):
+        """
+        wait the encoding and add images in order
+        """
+        for name, png in self.pending_images[len(self.images) :]:
+            view_index = buffer.add_view(name, png.result())
+            self.images.append(
+                gltf.GLTFImage(
+                    name=name,
+                    uri=None,
+                    mimeType=gltf.MimeType.Png,
+                    bufferView=view_index,
+                )
+            )
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
+            if self.cache:
+                self.cache.trim()
+
     def get_material_index(
         self, material: bpy.types.Material, bufferManager: BufferManager
     ) -> int:
@@ -1,8 +1,10 @@
-from typing import Any, NamedTuple, Self, Iterator, Iterable
+from typing import Any, NamedTuple, Self
 import array
 import mathutils  # type: ignore
 import ctypes
+import numpy
 import bpy
+from ..gltf.accessor_util import ComponentType, get_min_max
 
 
 class Vector2(ctypes.LittleEndianStructure):
@@ -27,40 +29,6 @@ def Vector3_from_meshVertex(v: mathutils.Vector) -> Vector3:
     return Vector3(v.x, v.z, -v.y)
 
 
-def get_min_max2(values: Iterator[Vector2]) -> tuple[list[float], list[float]]:
-    min: list[float] = [float("inf")] * 2
-    max: list[float] = [float("-inf")] * 2
-    for v in values:
-        if v.x < min[0]:
-            min[0] = v.x
-        if v.x > max[0]:
-            max[0] = v.x
-        if v.y < min[1]:
-            min[1] = v.y
-        if v.y > max[1]:
-            max[1] = v.y
-    return min, max
-
-
-def get_min_max3(values: Iterable[Vector3]):
-    min: list[float] = [float("inf")] * 3
-    max: list[float] = [float("-inf")] * 3
-    for v in values:
-        if v.x < min[0]:
-            min[0] = v.x
-        if v.x > max[0]:
-            max[0] = v.x
-        if v.y < min[1]:
-            min[1] = v.y
-        if v.y > max[1]:
-            max[1] = v.y
-        if v.z < min[2]:
-            min[2] = v.z
-        if v.z > max[2]:
-            max[2] = v.z
-    return min, max
-
-
 class Submesh:
     def __init__(self, material_index: int) -> None:
         self.indices: Any = array.array("I")
@@ -91,57 +59,71 @@ class IVector4(ctypes.LittleEndianStructure):
     ]
 
 
-class BoneWeight(ctypes.LittleEndianStructure):
-    _fields_ = [
-        ("i0", ctypes.c_int),
-        ("i1", ctypes.c_int),
-        ("i2", ctypes.c_int),
-        ("i3", ctypes.c_int),
-        ("weights", Vector4),
-    ]
+def gather_vertex_groups(
+    vertices: Any,
+) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """
+    vertex groups of all vertices in CSR form. (counts, groups, weights)
+    """
+    counts = array.array("i")
+    groups = array.array("i")
+    weights = array.array("f")
+    for v in vertices:
+        vertex_groups = v.groups
+        counts.append(len(vertex_groups))
+        for g in vertex_groups:
+            groups.append(g.group)
+            weights.append(g.weight)
+    return (
+        numpy.array(counts, numpy.int64),
+        numpy.array(groups, numpy.int32),
+        numpy.array(weights, numpy.float32),
+    )
 
 
-def PushBoneWeight(self: BoneWeight, i: int, w: float):
-    if self.weights.x == 0:
-        self.i0 = i
-        self.weights.x = w
-    elif self.weights.y == 0:
-        self.i1 = i
-        self.weights.y = w
-    elif self.weights.z == 0:
-        self.i2 = i
-        self.weights.z = w
-    elif self.weights.w == 0:
-        self.i3 = i
-        self.weights.w = w
-    else:
-        # raise NotImplementedError()
-        print("over 4")
-
-
-def GetBoneJoints(self: BoneWeight, group_index_to_joint_index: dict[int, int]):
-    return IVector4(
-        (
-            group_index_to_joint_index[self.i0]
-            if self.i0 in group_index_to_joint_index
-            else 0
-        ),
-        (
-            group_index_to_joint_index[self.i1]
-            if self.i1 in group_index_to_joint_index
-            else 0
-        ),
-        (
-            group_index_to_joint_index[self.i2]
-            if self.i2 in group_index_to_joint_index
-            else 0
-        ),
-        (
-            group_index_to_joint_index[self.i3]
-            if self.i3 in group_index_to_joint_index
-            else 0
-        ),
+def top4_weights(
+    counts: numpy.ndarray,
+    groups: numpy.ndarray,
+    weights: numpy.ndarray,
+    use_group: numpy.ndarray,
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    the 4 largest weights of each vertex in use_group(bool for each group index),
+    renormalized to sum 1. returns groups (n, 4) and weights (n, 4) in descending
+    order of weight. unused slots are group 0 with weight 0.
+    """
+    vertex_count = len(counts)
+    row = numpy.repeat(numpy.arange(vertex_count), counts)
+    valid = groups < len(use_group)
+    keep = valid & (weights > 0)
+    keep[valid] &= use_group[groups[valid]]
+    row, groups, weights = row[keep], groups[keep], weights[keep]
+
+    # CSR to dense (n, max influence)
+    counts = numpy.bincount(row, minlength=vertex_count)
+    width = max(4, int(counts.max()) if vertex_count else 0)
+    column = numpy.arange(len(row)) - (numpy.cumsum(counts) - counts)[row]
+    dense_groups = numpy.zeros((vertex_count, width), numpy.int32)
+    dense_weights = numpy.zeros((vertex_count, width), numpy.float32)
+    dense_groups[row, column] = groups
+    dense_weights[row, column] = weights
+
+    if width > 4:
+        top = numpy.argpartition(-dense_weights, 3, axis=1)[:, :4]
+        dense_groups = numpy.take_along_axis(dense_groups, top, 1)
+        dense_weights = numpy.take_along_axis(dense_weights, top, 1)
+    order = numpy.argsort(-dense_weights, axis=1, kind="stable")
+    dense_groups = numpy.take_along_axis(dense_groups, order, 1)
+    dense_weights = numpy.take_along_axis(dense_weights, order, 1)
+
+    total = dense_weights.sum(axis=1, keepdims=True)
+    dense_weights = numpy.divide(
+        dense_weights,
+        total,
+        out=numpy.zeros_like(dense_weights),
+        where=total > 0,
     )
+    return dense_groups, dense_weights
 
 
 class Mesh(NamedTuple):
@@ -155,8 +137,31 @@ class Mesh(NamedTuple):
     weights: memoryview | None
 
 
+def y_up(xyz: numpy.ndarray) -> numpy.ndarray:
+    """
+    (n, 3) z-up to y-up. same as Vector3_from_meshVertex
+    """
+    return xyz[:, [0, 2, 1]] * numpy.array([1, 1, -1], numpy.float32)
+
+
+def to_ctypes(t: Any, values: numpy.ndarray) -> Any:
+    """
+    ctypes.Array of t from the rows of values
+    """
+    return (t * len(values)).from_buffer_copy(values.tobytes())
+
+
+def foreach_get(
+    collection: Any, attribute: str, count: int, dtype: type, components: int = 1
+) -> numpy.ndarray:
+    values = numpy.empty(count * components, dtype)
+    collection.foreach_get(attribute, values)
+    if components == 1:
+        return values
+    return values.reshape(count, components)
+
+
 class MeshStore:
-    # TODO: https://docs.blender.org/manual/ja/latest/modeling/meshes/editing/mesh/sort_elements.html
     def __init__(
         self,
         mesh: bpy.types.Mesh,
@@ -165,60 +170,77 @@ class MeshStore:
     ) -> None:
         self.name = mesh.name
         mesh.calc_loop_triangles()
-        self.positions: ctypes.Array[Vector3] = (Vector3 * len(mesh.loops))()
-        self.normals: ctypes.Array[Vector3] = (Vector3 * len(mesh.loops))()
         self.materials: list[bpy.types.Material] = [m for m in mesh.materials]
         self.submeshes: list[Submesh] = []
 
-        submesh = Submesh(0)
-        self.submeshes.append(submesh)
+        vertex_count = len(mesh.vertices)
+        loop_count = len(mesh.loops)
+        triangle_count = len(mesh.loop_triangles)
+
+        # a vertex for each loop
+        loop_vertices = foreach_get(mesh.loops, "vertex_index", loop_count, numpy.int32)
+        co = foreach_get(mesh.vertices, "co", vertex_count, numpy.float32, 3)
+        normal = foreach_get(mesh.vertices, "normal", vertex_count, numpy.float32, 3)
+        self.positions: ctypes.Array[Vector3] = to_ctypes(
+            Vector3, y_up(co)[loop_vertices]
+        )
+        self.normals: ctypes.Array[Vector3] = to_ctypes(
+            Vector3, y_up(normal)[loop_vertices]
+        )
 
         uv_layer = mesh.uv_layers and mesh.uv_layers[0]
         self.uv: ctypes.Array[Vector2] | None = None
         if isinstance(uv_layer, bpy.types.MeshUVLoopLayer) and uv_layer:
-            self.uv = (Vector2 * len(mesh.loops))()
-
-        for tri in mesh.loop_triangles:
-            for loop_index in tri.loops:
-                # dst = vertices[loop_index]
-                v = mesh.vertices[mesh.loops[loop_index].vertex_index]
-                self.positions[loop_index] = Vector3_from_meshVertex(v.co)                
-                if False and tri.normal:
-                    self.normals[loop_index] = Vector3_from_meshVertex(tri.normal)
-                else:
-                    self.normals[loop_index] = Vector3_from_meshVertex(v.normal)
-                if self.uv:
-                    self.uv[loop_index] = Vector2(*uv_layer.data[loop_index].uv) # type: ignore
-
-                submesh.indices.append(loop_index)
+            uv = foreach_get(uv_layer.data, "uv", loop_count, numpy.float32, 2)
+            self.uv = to_ctypes(Vector2, uv)
+
+        # a submesh for each material. stable sort keeps the face order
+        loops = foreach_get(
+            mesh.loop_triangles, "loops", triangle_count, numpy.int32, 3
+        )
+        material_index = foreach_get(
+            mesh.loop_triangles, "material_index", triangle_count, numpy.int32
+        )
+        order = numpy.argsort(material_index, kind="stable")
+        material_index = material_index[order]
+        loops = loops[order].astype(numpy.uint32)
+        used, begin = numpy.unique(material_index, return_index=True)
+        end = numpy.append(begin[1:], triangle_count)
+        for m, b, e in zip(used.tolist(), begin.tolist(), end.tolist()):
+            submesh = Submesh(m)
+            submesh.indices.frombytes(loops[b:e].tobytes())
+            self.submeshes.append(submesh)
+        if not self.submeshes:
+            self.submeshes.append(Submesh(0))
 
         self.vertex_group_names = [g.name for g in vertex_groups]
         self.bone_names = bone_names
-        self.bone_weights = (BoneWeight * len(mesh.loops))()
-        for i, v in enumerate(mesh.loops):
-            ve = mesh.vertices[v.vertex_index]
-            for g in ve.groups:
-                vg_name = self.vertex_group_names[g.group]
-                if vg_name in self.bone_names:
-                    PushBoneWeight(self.bone_weights[i], g.group, g.weight)
+        use_group = numpy.array(
+            [name in bone_names for name in self.vertex_group_names], bool
+        )
+        groups, weights = top4_weights(*gather_vertex_groups(mesh.vertices), use_group)
+        # (loops, 4) vertex group index and weight
+        self.bone_groups = groups[loop_vertices]
+        self.bone_weights = weights[loop_vertices]
 
     def freeze(self, skin_bone_names: list[str]) -> Mesh:
-        position_min, position_max = get_min_max3(self.positions)
+        position_min, position_max = get_min_max(
+            self.positions, ComponentType.Float, "VEC3"
+        )
         joints = None
         weights = None
         if skin_bone_names and len(skin_bone_names) > 0:
-            group_index_to_joint_index = {
-                i: skin_bone_names.index(vertex_group)
-                for i, vertex_group in enumerate(self.vertex_group_names)
-                if vertex_group in skin_bone_names
-            }
-            joints = (IVector4 * len(self.positions))()
-            weights = (Vector4 * len(self.positions))()
-            for i in range(len(self.positions)):
-                joints[i] = GetBoneJoints(
-                    self.bone_weights[i], group_index_to_joint_index
-                )
-                weights[i] = self.bone_weights[i].weights
+            joint_map = {name: i for i, name in enumerate(skin_bone_names)}
+            # vertex group index to joint index
+            lookup = numpy.array(
+                [joint_map.get(name, 0) for name in self.vertex_group_names] or [0],
+                numpy.uint16,
+            )
+            joint_indices = numpy.where(
+                self.bone_weights > 0, lookup[self.bone_groups], 0
+            ).astype(numpy.uint16)
+            joints = to_ctypes(IVector4, joint_indices)
+            weights = to_ctypes(Vector4, self.bone_weights)
 
         return Mesh(
             name=self.name,
@@ -232,3 +254,67 @@ class MeshStore:
             joints=memoryview(joints) if joints else None,  # type: ignore
             weights=memoryview(weights) if weights else None,  # type: ignore
         )
+
+
+def _byte_rows(values: memoryview) -> numpy.ndarray:
+    """
+    (count, itemsize) uint8 view of a ctypes.Array memoryview
+    """
+    return numpy.frombuffer(values.cast("B"), numpy.uint8).reshape(
+        len(values), values.itemsize
+    )
+
+
+def _take_rows(values: memoryview, rows: numpy.ndarray) -> memoryview:
+    """
+    rows of values as a new ctypes.Array of the same element type
+    """
+    element_type = values.obj._type_  # type: ignore
+    return memoryview(to_ctypes(element_type, _byte_rows(values)[rows]))
+
+
+def weld(mesh: Mesh) -> Mesh:
+    """
+    one vertex for each identical (position, normal, uv, joints, weights).
+    submesh indices are remapped. vertices keep first appearance order.
+    """
+    attributes = [mesh.positions.values, mesh.normals.values]
+    if mesh.uvs:
+        attributes.append(mesh.uvs.values)
+    if mesh.joints and mesh.weights:
+        attributes += [mesh.joints, mesh.weights]
+
+    packed = numpy.ascontiguousarray(
+        numpy.concatenate([_byte_rows(a) for a in attributes], axis=1)
+    )
+    keys = packed.view(numpy.dtype((numpy.void, packed.shape[1])))[:, 0]
+    _, first, inverse = numpy.unique(keys, return_index=True, return_inverse=True)
+
+    # sorted order to first appearance order
+    order = numpy.argsort(first)
+    rank = numpy.empty_like(order)
+    rank[order] = numpy.arange(len(order))
+    rows = first[order]
+    remap = rank[inverse.reshape(-1)].astype(numpy.uint32)
+
+    submeshes: list[Submesh] = []
+    for submesh in mesh.submeshes:
+        welded = Submesh(submesh.material_index)
+        indices = numpy.frombuffer(submesh.indices, numpy.uint32)
+        welded.indices.frombytes(remap[indices].tobytes())
+        submeshes.append(welded)
+
+    return mesh._replace(
+        positions=mesh.positions._replace(
+            values=_take_rows(mesh.positions.values, rows)
+        ),
+        normals=mesh.normals._replace(values=_take_rows(mesh.normals.values, rows)),
+        uvs=(
+            mesh.uvs._replace(values=_take_rows(mesh.uvs.values, rows))
+            if mesh.uvs
+            else None
+        ),
+        submeshes=submeshes,
+        joints=_take_rows(mesh.joints, rows) if mesh.joints else None,
+        weights=_take_rows(mesh.weights, rows) if mesh.weights else None,
+    )
@@ -4,8 +4,9 @@ import bpy
 
 from . import gltf
 from .buffermanager import BufferManager
-from .materialstore import MaterialStore
+from .materialstore import MaterialStore, PngCache, DEFAULT_COMPRESS_LEVEL
 from .gltfbuilder import GLTFBuilder, Node, Skin, Any
+from . import meshstore
 from .meshstore import Mesh
 
 
@@ -123,39 +124,58 @@ def to_mesh(
 
 
 def to_gltf(
-    self: GLTFBuilder, gltf_path: pathlib.Path, bin_path: pathlib.Path | None
+    self: GLTFBuilder,
+    gltf_path: pathlib.Path,
+    bin_path: pathlib.Path | None,
+    weld: bool = False,
+    compress_level: int = DEFAULT_COMPRESS_LEVEL,
+    cache_textures: bool = False,
+    dedup: bool = False,
 ) -> tuple[gltf.GLTF, bytearray]:
+    """
+    weld: merge identical vertices of each mesh
+    compress_level: zlib level of png textures
+    cache_textures: reuse png encoded by previous exports from the user cache
+    dedup: share one bufferView between identical payloads
+    """
     # create buffer
-    buffer = BufferManager()
+    buffer = BufferManager(dedup=dedup)
 
     # material
-    material_store = MaterialStore()
+    material_store = MaterialStore(
+        compress_level, cache=PngCache.default() if cache_textures else None
+    )
 
     meshes: list[gltf.GLTFMesh] = []
     for store in self.mesh_stores:
         skin = self.get_skin_for_store(store)
         bone_names: list[str] = []
         if skin:
-            bone_names = [joint.name for joint in skin.root.traverse()]
-        meshes.append(to_mesh(store.freeze(bone_names), buffer, material_store))
+            bone_names = [joint.name for joint in skin.joints]
+        mesh = store.freeze(bone_names)
+        if weld:
+            mesh = meshstore.weld(mesh)
+        meshes.append(to_mesh(mesh, buffer, material_store))
+
+    material_store.flush_images(buffer)
 
     def to_gltf_node(node: Node):
         p = node.get_local_position()
         return gltf.GLTFNode(
             name=node.name,
-            children=[self.nodes.index(child) for child in node.children],
+            children=[self.node_indices[child] for child in node.children],
             translation=(p.x, p.y, p.z),
-            mesh=self.mesh_stores.index(node.mesh) if node.mesh else None,
-            skin=self.skins.index(node.skin) if node.skin else None,
+            mesh=self.mesh_store_indices[node.mesh] if node.mesh else None,
+            skin=self.skin_indices[node.skin] if node.skin else None,
         )
 
     def to_gltf_skin(skin: Skin):
-        joints = [joint for joint in skin.root.traverse()]
+        joints = skin.joints
 
-        matrices = (Matrix4 * len(joints))()
-        for i, _ in enumerate(joints):
-            p = joints[i].position
-            matrices[i] = Matrix4.translation(-p.x, -p.y, -p.z)
+        # one bufferView for each skin
+        matrices = (Matrix4 * len(joints)).from_buffer_copy(
+            skin.get_inverse_bind_matrices().tobytes()
+        )
         matrix_index = buffer.push_bytes(
             f"{skin.root.name}.inverseBindMatrices", memoryview(matrices)
         )  # type: ignore
@@ -163,12 +183,12 @@ def to_gltf(
         return gltf.GLTFSkin(
             name=skin.root.name,
             inverseBindMatrices=matrix_index,
-            skeleton=self.nodes.index(skin.root),
-            joints=[self.nodes.index(joint) for joint in joints],
+            skeleton=self.node_indices[skin.root],
+            joints=[self.node_indices[joint] for joint in joints],
         )
 
     scene = gltf.GLTFScene(
-        name="scene", nodes=[self.nodes.index(node) for node in self.root_nodes]
+        name="scene", nodes=[self.node_indices[node] for node in self.root_nodes]
     )
 
     nodes = [to_gltf_node(node) for node in self.nodes]
@@ -0,0 +1,60 @@
+import unittest
+import numpy
+from humanoidio.blender_scene import animation_scanner
+
+
+class KeyframePoints:
+    def __init__(self, co: numpy.ndarray):
+        self.co = co
+
+    def __len__(self) -> int:
+        return len(self.co)
+
+    def foreach_get(self, attr: str, values: numpy.ndarray):
+        assert attr == "co"
+        values[:] = self.co.reshape(-1)
+
+
+class FCurve:
+    """
+    linear keyframes
+    """
+
+    def __init__(self, array_index: int, times: list[float], values: list[float]):
+        self.array_index = array_index
+        self.keyframe_points = KeyframePoints(
+            numpy.array([times, values], numpy.float32).T
+        )
+
+    def evaluate(self, t: float) -> float:
+        co = self.keyframe_points.co
+        return float(numpy.interp(t, co[:, 0], co[:, 1]))
+
+
+class TestAnimationScanner(unittest.TestCase):
+    def test_partial_axes(self):
+        # location z only
+        times, values = animation_scanner.get_curve(
+            "location", [FCurve(2, [1, 5], [0, 4])], (1, 2, 3)
+        )
+        self.assertEqual([1, 5], list(times))
+        values = numpy.frombuffer(values, numpy.float32).reshape(-1, 3)
+        self.assertEqual([[1, 2, 0], [1, 2, 4]], values.tolist())
+
+    def test_misaligned_axes(self):
+        times, values = animation_scanner.get_curve(
+            "scale",
+            [
+                FCurve(0, [0, 10], [1, 2]),
+                FCurve(1, [0, 5, 10], [1, 3, 1]),
+            ],
+            (1, 1, 1),
+        )
+        self.assertEqual([0, 5, 10], list(times))
+        values = numpy.frombuffer(values, numpy.float32).reshape(-1, 3)
+        # x is evaluated at the key of y
+        self.assertEqual([[1, 1, 1], [1.5, 3, 1], [2, 1, 1]], values.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
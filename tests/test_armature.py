@@ -0,0 +1,64 @@
+import math
+import unittest
+import numpy
+from humanoidio import gltf
+from humanoidio.blender_scene import armature
+
+
+class TestArmature(unittest.TestCase):
+    def test_rotated_parent(self):
+        # rotate 90 degrees around z and scale 2
+        s = math.sin(math.pi / 4)
+        root = gltf.Node(
+            "root", translation=(1, 0, 0), rotation=(0, 0, s, s), scale=(2, 2, 2)
+        )
+        bone = gltf.Node("bone", translation=(1, 0, 0))
+        tip = gltf.Node("tip", translation=(0, 1, 0))
+        root.add_child(bone)
+        bone.add_child(tip)
+
+        layout = armature.layout_bones([bone, tip])
+        numpy.testing.assert_allclose(
+            layout.heads, [[1, 2, 0], [-1, 2, 0]], atol=1e-9
+        )
+        # connected to the child and extended from the parent
+        numpy.testing.assert_allclose(
+            layout.tails, [[-1, 2, 0], [-3, 2, 0]], atol=1e-9
+        )
+        self.assertEqual([-1, 0], layout.parents.tolist())
+        self.assertEqual([False, True], layout.use_connect.tolist())
+
+    def test_tails(self):
+        hips = gltf.Node("hips", translation=(0, 1, 0), humanoid_bone="hips")
+        spine = gltf.Node("spine", translation=(0, 0.2, 0), humanoid_bone="spine")
+        shoulder = gltf.Node(
+            "shoulder", translation=(0.1, 0, 0), humanoid_bone="leftShoulder"
+        )
+        arm = gltf.Node("arm", translation=(0.2, 0, 0), humanoid_bone="leftUpperArm")
+        leg = gltf.Node("leg", translation=(0.1, -0.1, 0), humanoid_bone="leftUpperLeg")
+        same = gltf.Node("same")
+        hips.add_child(leg)
+        hips.add_child(spine)
+        spine.add_child(shoulder)
+        shoulder.add_child(arm)
+        leg.add_child(same)
+
+        layout = armature.layout_bones([hips, spine, shoulder, arm, leg, same])
+        heads = layout.heads
+        tails = layout.tails
+        # leg is excluded. connect to spine
+        numpy.testing.assert_allclose(tails[0], heads[1])
+        # leftShoulder is excluded. default tail
+        numpy.testing.assert_allclose(tails[1], heads[1] + (0, 0.1, 0))
+        # not use_connect under the shoulder
+        self.assertEqual(
+            [False, True, False, False, False, True], layout.use_connect.tolist()
+        )
+        # leaf extends the parent direction
+        numpy.testing.assert_allclose(tails[3], heads[3] * 2 - heads[2])
+        # the child at the same position. offset not to be zero length
+        numpy.testing.assert_allclose(tails[4], heads[5] + (0, 0, 1e-4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import math
+import unittest
+import numpy
+from humanoidio import gltf
+from humanoidio.gltf import coordinate
+
+
+def quaternion_to_matrix(q: numpy.ndarray) -> numpy.ndarray:
+    x, y, z, w = q
+    return numpy.array(
+        [
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+        ]
+    )
+
+
+class TestCoordinate(unittest.TestCase):
+    def test_basis(self):
+        # glTF forward(+z) is blender -y when loaded facing the viewer
+        conversion = gltf.Conversion(
+            gltf.Coordinate.GLTF, gltf.Coordinate.BLENDER_ROTATE
+        )
+        values = numpy.array([[1, 2, 3]], numpy.float32)
+        conversion.convert_positions(values)
+        self.assertEqual([[1, -3, 2]], values.tolist())
+        self.assertFalse(conversion.flip)
+
+        conversion = gltf.Conversion(gltf.Coordinate.VRM0, gltf.Coordinate.BLENDER)
+        values = numpy.array([[1, 2, 3]], numpy.float32)
+        conversion.convert_positions(values)
+        self.assertEqual([[1, -3, 2]], values.tolist())
+
+        # cached
+        self.assertIs(
+            conversion.matrix,
+            coordinate.get_basis(gltf.Coordinate.VRM0, gltf.Coordinate.BLENDER)[0],
+        )
+
+    def test_flip(self):
+        conversion = gltf.Conversion(gltf.Coordinate.GLTF, gltf.Coordinate.UNITY)
+        self.assertTrue(conversion.flip)
+
+        values = numpy.array([[1, 2, 3]], numpy.float32)
+        conversion.convert_positions(values)
+        self.assertEqual([[-1, 2, 3]], values.tolist())
+
+        # winding is reversed
+        indices = numpy.array([[0, 1, 2], [3, 4, 5]], numpy.uint32)
+        conversion.convert_indices(indices)
+        self.assertEqual([[0, 2, 1], [3, 5, 4]], indices.tolist())
+
+    def test_rotation(self):
+        axis = numpy.array([1, 2, 3]) / math.sqrt(14)
+        s = math.sin(0.6)
+        q = numpy.array([[*(axis * s), math.cos(0.6)]])
+        for dst in (gltf.Coordinate.BLENDER, gltf.Coordinate.UNITY):
+            conversion = gltf.Conversion(gltf.Coordinate.GLTF, dst)
+            m = conversion.matrix.astype(numpy.float64)
+            converted = q.copy()
+            conversion.convert_rotations(converted)
+            # same as the rotation matrix in the new basis
+            numpy.testing.assert_allclose(
+                quaternion_to_matrix(converted[0]),
+                m @ quaternion_to_matrix(q[0]) @ m.T,
+                atol=1e-6,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import io
+import json
+import unittest
+from humanoidio.gltf import glb
+
+
+class TestGlb(unittest.TestCase):
+    def test_write_glb(self):
+        json_body = json.dumps({"asset": {"version": "2.0"}}).encode("utf-8")
+        bin = bytearray(b"\x01\x02\x03\x04\x05")
+        f = io.BytesIO()
+        size = glb.write_glb(f, json_body, memoryview(bin))
+        data = f.getvalue()
+        self.assertEqual(size, len(data))
+        self.assertEqual(0, size % 4)
+
+        json_chunk, bin_chunk = glb.get_glb_chunks(data)
+        # JSON is padded with spaces and BIN with zeros
+        self.assertEqual(json_body, bytes(json_chunk).rstrip(b" "))
+        self.assertEqual(bytes(bin) + b"\0" * 3, bytes(bin_chunk))
+
+    def test_to_glb(self):
+        gltf = {"asset": {"version": "2.0"}}
+        bin = b"\x01\x02\x03\x04"
+        f = io.BytesIO()
+        glb.write_glb(f, json.dumps(gltf).encode("utf-8"), bin)
+        self.assertEqual(f.getvalue(), glb.to_glb(gltf, bin))
+
+
+if __name__ == "__main__":
+    unittest.main()
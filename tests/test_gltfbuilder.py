@@ -0,0 +1,25 @@
+import unittest
+import numpy
+import mathutils  # type: ignore
+from humanoidio.yup import gltfbuilder
+
+
+class TestGltfBuilder(unittest.TestCase):
+    def test_inverse_bind_matrices(self):
+        # blender z-up to y-up: (x, z, -y)
+        root = gltfbuilder.Node("root", mathutils.Vector((1, 2, 3)), None)
+        child = gltfbuilder.Node("child", mathutils.Vector((0, -1, 5)), root)
+        root.children.append(child)
+        skin = gltfbuilder.Skin(root, None)  # type: ignore
+
+        matrices = skin.get_inverse_bind_matrices()
+        self.assertEqual((2, 4, 4), matrices.shape)
+        self.assertEqual(numpy.float32, matrices.dtype)
+        # column major. the negated translation is row 3
+        numpy.testing.assert_array_equal(matrices[:, :3, :3], [numpy.eye(3)] * 2)
+        self.assertEqual([[-1, -3, 2, 1], [0, -5, -1, 1]], matrices[:, 3].tolist())
+        self.assertEqual([[0, 0, 0], [0, 0, 0]], matrices[:, :3, 3].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import ctypes
+import unittest
+from humanoidio import gltf
+from humanoidio.blender_scene import mesh
+
+
+class TestImportMesh(unittest.TestCase):
+    def test_get_triangles(self):
+        indices = (ctypes.c_int * 14)(
+            # valid
+            0, 1, 2,
+            # degenerate
+            0, 0, 1,
+            # same vertices as the first
+            1, 2, 0,
+            # second submesh
+            2, 3, 0,
+            # remainder that is not a triangle is ignored
+            3, 2,
+        )  # fmt: skip
+        submeshes = [
+            gltf.Submesh(0, 9, 0),
+            gltf.Submesh(9, 5, 1),
+        ]
+        triangles, materials = mesh.get_triangles(indices, submeshes)
+        self.assertEqual([[0, 1, 2], [2, 3, 0]], triangles.tolist())
+        self.assertEqual([0, 1], materials.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
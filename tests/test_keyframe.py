@@ -0,0 +1,38 @@
+import math
+import unittest
+import numpy
+from humanoidio.gltf import keyframe
+
+
+class TestKeyframe(unittest.TestCase):
+    def test_linear(self):
+        times = numpy.linspace(0, 10, 101)
+        values = numpy.stack([times, times * 2, numpy.zeros_like(times)], -1)
+        (keys,) = keyframe.reduce_channels(times, values[None], 1e-4, False)
+        self.assertEqual([0, 100], keys.tolist())
+
+    def test_rotation(self):
+        times = numpy.linspace(0, 10, 1001)
+        angles = numpy.sin(times)
+        zeros = numpy.zeros_like(angles)
+        q = numpy.stack(
+            [zeros, zeros, numpy.sin(angles / 2), numpy.cos(angles / 2)], -1
+        )
+        tolerance = math.radians(0.5)
+        (keys,) = keyframe.reduce_channels(times, q[None], tolerance, True)
+        self.assertLess(len(keys), 100)
+
+        # error between kept keyframes
+        for k0, k1 in zip(keys[:-1], keys[1:]):
+            t = (times[k0 : k1 + 1] - times[k0]) / (times[k1] - times[k0])
+            approx = keyframe.slerp(
+                numpy.repeat(q[k0 : k0 + 1], len(t), 0),
+                numpy.repeat(q[k1 : k1 + 1], len(t), 0),
+                t,
+            )
+            error = keyframe.angle_error(approx, q[k0 : k1 + 1])
+            self.assertLessEqual(error.max(), tolerance + 1e-9)
+
+
+if __name__ == "__main__":
+    unittest.main()
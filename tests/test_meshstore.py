@@ -0,0 +1,75 @@
+import unittest
+import numpy
+from humanoidio.yup import meshstore
+
+
+def make_mesh(positions: list, indices: list) -> meshstore.Mesh:
+    positions = numpy.array(positions, numpy.float32)
+    normals = numpy.zeros_like(positions)
+    normals[:, 2] = 1
+    submesh = meshstore.Submesh(0)
+    submesh.indices.extend(indices)
+    return meshstore.Mesh(
+        "mesh",
+        meshstore.Values(
+            memoryview(meshstore.to_ctypes(meshstore.Vector3, positions))
+        ),
+        meshstore.Values(memoryview(meshstore.to_ctypes(meshstore.Vector3, normals))),
+        None,
+        [],
+        [submesh],
+        None,
+        None,
+    )
+
+
+class TestMeshStore(unittest.TestCase):
+    def test_weld(self):
+        # two triangles of a quad. the shared edge is duplicated
+        mesh = make_mesh(
+            [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 0, 0], [1, 1, 0], [0, 1, 0]],
+            [0, 1, 2, 3, 4, 5],
+        )
+        welded = meshstore.weld(mesh)
+        positions = numpy.frombuffer(welded.positions.values.cast("B"), numpy.float32)
+        # first appearance order
+        self.assertEqual(
+            [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]],
+            positions.reshape(-1, 3).tolist(),
+        )
+        self.assertEqual([0, 1, 2, 0, 2, 3], welded.submeshes[0].indices.tolist())
+        self.assertEqual(4, len(welded.normals.values))
+
+    def test_weld_attributes(self):
+        # same position, different normal
+        mesh = make_mesh([[0, 0, 0], [0, 0, 0], [1, 0, 0]], [0, 1, 2])
+        normals = numpy.frombuffer(mesh.normals.values.cast("B"), numpy.float32)
+        normals.reshape(-1, 3)[1] = (0, 1, 0)
+        welded = meshstore.weld(mesh)
+        self.assertEqual(3, len(welded.positions.values))
+        self.assertEqual([0, 1, 2], welded.submeshes[0].indices.tolist())
+
+    def test_top4_weights(self):
+        # vertex 0: 5 influences. vertex 1: zero weight and unused group.
+        # vertex 2: none
+        counts = numpy.array([5, 3, 0])
+        groups = numpy.array([0, 1, 2, 3, 4, 0, 1, 2])
+        weights = numpy.array([0.1, 0.4, 0.2, 0.05, 0.25, 0.0, 0.5, 0.5], numpy.float32)
+        use_group = numpy.array([True, True, False, True, True])
+        top_groups, top_weights = meshstore.top4_weights(
+            counts, groups, weights, use_group
+        )
+        self.assertEqual((3, 4), top_groups.shape)
+        # group 2 is not used. the smallest of the rest is dropped
+        self.assertEqual([1, 4, 0, 3], top_groups[0].tolist())
+        numpy.testing.assert_allclose(
+            top_weights[0], numpy.array([0.4, 0.25, 0.1, 0.05]) / 0.8, rtol=1e-6
+        )
+        # zero weight is dropped. unused slots are group 0 with weight 0
+        self.assertEqual([1, 0, 0, 0], top_groups[1].tolist())
+        self.assertEqual([1, 0, 0, 0], top_weights[1].tolist())
+        self.assertEqual([0, 0, 0, 0], top_weights[2].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import io
+import json
+import unittest
+import numpy
+from humanoidio import gltf
+from humanoidio.gltf import glb
+from humanoidio.mmd import vmd as vmd_glb
+from humanoidio.mmd.pymeshio import vmd
+from humanoidio.mmd.pymeshio.vmd import reader, writer
+from humanoidio.mmd import sampler
+
+
+def make_motion() -> vmd.Motion:
+    motion = vmd.Motion("model")
+    motion.bones["センター"] = vmd.BoneTrack(
+        "センター",
+        numpy.array([0, 10, 20], numpy.uint32),
+        numpy.array([[0, 0, 0], [0, 10, 0], [0, 0, 0]], numpy.float32),
+        numpy.array([[0, 0, 0, 1], [0, 0, 0, 1], [0, 0, 0, 1]], numpy.float32),
+        numpy.full((3, 64), 20, numpy.uint8),
+    )
+    motion.morphs["あ"] = vmd.MorphTrack(
+        "あ",
+        numpy.array([0, 5], numpy.uint32),
+        numpy.array([0, 1], numpy.float32),
+    )
+    return motion
+
+
+class TestVmd(unittest.TestCase):
+    def test_signature(self):
+        with self.assertRaises(Exception):
+            reader.read(io.BytesIO(b"Pmd" + b"\x00" * 60))
+
+    def test_read_write(self):
+        w = io.BytesIO()
+        writer.write(w, make_motion())
+        motion = reader.read(io.BytesIO(w.getvalue()))
+        self.assertEqual("model", motion.model_name)
+        self.assertEqual(20, motion.last_frame)
+        track = motion.bones["センター"]
+        self.assertEqual([0, 10, 20], track.frames.tolist())
+        self.assertEqual(10, track.positions[1][1])
+        self.assertEqual((3, 64), track.interpolation.shape)
+        self.assertEqual([0, 5], motion.morphs["あ"].frames.tolist())
+
+    def test_sort(self):
+        frames = numpy.zeros(4, vmd.BONE_FRAME_DTYPE)
+        frames["name"] = [b"b", b"a", b"b\x00garbage", b"a"]
+        frames["frame"] = [3, 2, 1, 0]
+        tracks = dict(reader.split_by_name(frames))
+        self.assertEqual(["a", "b"], list(tracks.keys()))
+        self.assertEqual([1, 3], tracks["b"]["frame"].tolist())
+        self.assertEqual([0, 2], tracks["a"]["frame"].tolist())
+
+    def test_sample(self):
+        motion = make_motion()
+        track = motion.bones["センター"]
+        # 90 degree around z at frame 20
+        track.rotations[2] = [0, 0, numpy.sqrt(0.5), numpy.sqrt(0.5)]
+        s = sampler.BoneSampler([track])
+        positions, rotations = s.sample(numpy.array([-1, 5, 10, 15, 30]))
+        self.assertEqual((1, 5, 3), positions.shape)
+        numpy.testing.assert_allclose([0, 5, 10, 5, 0], positions[0, :, 1], atol=1e-5)
+        numpy.testing.assert_allclose(
+            [0, 0, numpy.sin(numpy.pi / 8), numpy.cos(numpy.pi / 8)],
+            rotations[0, 3],
+            atol=1e-5,
+        )
+
+    def test_bezier(self):
+        # point symmetric around (0.5, 0.5)
+        x1 = numpy.full(3, 0.8)
+        y1 = numpy.zeros(3)
+        x2 = numpy.full(3, 0.2)
+        y2 = numpy.ones(3)
+        y = sampler.evaluate_bezier(x1, y1, x2, y2, numpy.array([0.25, 0.5, 0.75]))
+        self.assertAlmostEqual(0.5, y[1])
+        self.assertAlmostEqual(1, y[0] + y[2])
+
+    def test_vmd_to_glb(self):
+        motion = make_motion()
+        # rotation only
+        motion.bones["上半身"] = vmd.BoneTrack(
+            "上半身",
+            numpy.array([0, 7], numpy.uint32),
+            numpy.zeros((2, 3), numpy.float32),
+            numpy.array([[0, 0, 0, 1], [0, 0, 1, 0]], numpy.float32),
+            numpy.full((2, 64), 20, numpy.uint8),
+        )
+        center = gltf.Node("センター", translation=(0, 1, 0))
+        upper = gltf.Node("上半身", translation=(0, 0.5, 0))
+        center.add_child(upper)
+        loader = gltf.Loader("model", nodes=[center, upper], roots=[center])
+
+        data = vmd_glb.vmd_to_glb(motion, loader)
+        json_chunk, bin = glb.get_glb_chunks(data)
+        gltf_json = json.loads(json_chunk)
+
+        # 4 byte aligned
+        for view in gltf_json["bufferViews"]:
+            self.assertEqual(0, view["byteOffset"] % 4)
+            self.assertLessEqual(view["byteOffset"] + view["byteLength"], len(bin))
+        accessors = gltf_json["accessors"]
+        for accessor in accessors:
+            self.assertEqual(0, accessor.get("byteOffset", 0) % 4)
+
+        def read(index: int) -> numpy.ndarray:
+            accessor = accessors[index]
+            view = gltf_json["bufferViews"][accessor["bufferView"]]
+            size = {"SCALAR": 1, "VEC3": 3, "VEC4": 4}[accessor["type"]]
+            offset = view["byteOffset"] + accessor.get("byteOffset", 0)
+            return numpy.frombuffer(
+                bin, numpy.float32, accessor["count"] * size, offset
+            ).reshape(accessor["count"], size)
+
+        (animation,) = gltf_json["animations"]
+        targets = [
+            (channel["target"]["node"], channel["target"]["path"])
+            for channel in animation["channels"]
+        ]
+        self.assertEqual(
+            [(0, "rotation"), (1, "rotation"), (0, "translation")], targets
+        )
+
+        # one time accessor for all samplers. frame 0 to 20 at 30 fps
+        inputs = {sampler["input"] for sampler in animation["samplers"]}
+        self.assertEqual(1, len(inputs))
+        (time_accessor,) = inputs
+        times = read(time_accessor)
+        numpy.testing.assert_allclose(numpy.arange(21) / 30, times[:, 0], rtol=1e-6)
+        self.assertAlmostEqual(20 / 30, accessors[time_accessor]["max"][0], 6)
+
+        # rest translation + motion
+        translation = read(animation["samplers"][2]["output"])
+        self.assertEqual((21, 3), translation.shape)
+        numpy.testing.assert_allclose(
+            [0, 1 + 10 * 1.59 / 20, 0], translation[10], atol=1e-5
+        )
+        rotation = read(animation["samplers"][1]["output"])
+        self.assertEqual((21, 4), rotation.shape)
+        numpy.testing.assert_allclose(
+            1, numpy.linalg.norm(rotation, axis=1), atol=1e-5
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()